@@ -0,0 +1,321 @@
+import os
+
+import pandas as pd
+import streamlit as st
+
+from dados import (_carregar_dados, _ler_particao, classes_do_grupo, fonte_dados, legenda_df, listar_particoes, mapa_cores,
+                   rotulos_grupo, versao_arquivo)
+from filtros import carregar_motor
+from mudancas import densificar, maior_mudanca
+
+vegetacao_nativa = classes_do_grupo("vegetacao_nativa")
+antropicas = classes_do_grupo("antropica")
+agricolas = classes_do_grupo("agricola")
+tipo_antropizacao = rotulos_grupo("antropica", "Antropizado", "Natural")
+
+# Perda de vegetação nativa (%) a partir da qual o município é sinalizado
+LIMITE_PERDA_NATIVA = 30
+
+
+def somar(serie, niveis):
+    return serie.groupby(level=niveis, observed=True).sum().sort_index()
+
+
+def variacao(serie, niveis, anos_referencia):
+    # Áreas no ano inicial e final, com a diferença entre eles
+    ano_inicial, ano_final = anos_referencia
+    anos = serie.index.get_level_values("ano")
+    df_var = serie[anos.isin([ano_inicial, ano_final])].groupby(level=niveis + ["ano"], observed=True).sum().unstack("ano")
+    df_var = df_var.reindex(columns=[ano_inicial, ano_final]).fillna(0)
+    df_var.columns = list(df_var.columns)
+    df_var["variação"] = df_var[ano_final] - df_var[ano_inicial]
+    return df_var
+
+
+def antropizacao(serie, niveis):
+    # Índice de antropização de uma série com o nível nome_classe, agregado pelos níveis pedidos.
+    # O rótulo vem da legenda e, em índices categóricos, é mapeado só sobre as categorias.
+    tipo = serie.index.get_level_values("nome_classe").map(tipo_antropizacao).fillna("Natural")
+    df_idx = serie.groupby([serie.index.get_level_values(n) for n in niveis] + [tipo], observed=True).sum().unstack().fillna(0)
+    df_idx = df_idx.reindex(columns=["Antropizado", "Natural"], fill_value=0)
+    df_idx.index.names = niveis
+    df_idx["índice"] = (df_idx["Antropizado"] / (df_idx["Antropizado"] + df_idx["Natural"])) * 100
+    return df_idx
+
+
+def perda_vegetacao_nativa(df_var, nivel, anos_referencia):
+    # Área de vegetação nativa no ano inicial e final e a perda percentual, por entidade do nível
+    ano_inicial, ano_final = anos_referencia
+    nativa = df_var[df_var.index.get_level_values("nome_classe").isin(vegetacao_nativa)]
+    df_perda = nativa.groupby(level=nivel, observed=True)[[ano_inicial, ano_final]].sum()
+    area_inicial = df_perda[ano_inicial]
+    df_perda["perda_percentual"] = ((area_inicial - df_perda[ano_final]) / area_inicial.where(area_inicial > 0) * 100).fillna(0)
+    return df_perda
+
+
+def momentos(serie, niveis):
+    # Estatísticas combináveis da área: média e soma dos quadrados dos desvios (m2) de cada grupo
+    # permitem juntar grupos sem reler as linhas (combinar_momentos)
+    agrupado = serie.astype("float64").groupby(level=niveis, observed=True)
+    n = agrupado.size()
+    tabela = pd.DataFrame({"n": n, "media": agrupado.mean(), "m2": agrupado.var(ddof=0) * n,
+                           "minimo": agrupado.min(), "maximo": agrupado.max()})
+    return tabela.sort_index()
+
+
+def combinar_momentos(n, media, m2):
+    # Fórmula paralela de Chan et al.: m2 total = soma dos m2 + desvios das médias dos grupos em relação à média geral.
+    # Não subtrai termos grandes (soma2 - n·média²), então não perde precisão nem fica negativa em bases grandes
+    total = n.sum()
+    media_total = (n * media).sum() / total
+    return total, media_total, m2.sum() + (n * (media - media_total) ** 2).sum()
+
+
+def base_cubo(df):
+    return df.groupby(["NM_MUN", "ano", "nome_classe", "SIGLA_UF"], observed=True)["area_ha"].sum().sort_index()
+
+
+def juntar_bases(bases):
+    base = pd.concat(bases)
+    # Categorias em ordem alfabética, como na agregação de uma tabela única
+    niveis = [nivel.reorder_categories(sorted(nivel.categories)) if isinstance(nivel, pd.CategoricalIndex) else nivel
+              for nivel in base.index.levels]
+    base.index = base.index.set_levels(niveis)
+    return base.sort_index()
+
+
+def construir_cubo(df):
+    return montar_cubo(base_cubo(df))
+
+
+def montar_cubo(base):
+    # Tabelas derivadas da base (município, ano, classe, UF); os anos de referência vêm dos dados
+    anos = base.index.get_level_values("ano")
+    anos_referencia = (int(anos.min()), int(anos.max()))
+    decada = (base.index.get_level_values("ano") // 10) * 10
+    base_decada = base.groupby([base.index.get_level_values(n) for n in ["NM_MUN", "SIGLA_UF", "nome_classe"]] + [pd.Index(decada, name="decada")], observed=True).sum()
+
+    # Homônimos em UFs diferentes (ex.: Pau D'Arco) somados numa única série por nome, como no filtro por município
+    municipio_ano = somar(base, ["NM_MUN", "ano", "nome_classe"])
+    estado_ano = somar(base, ["SIGLA_UF", "ano", "nome_classe"])
+    total_ano = somar(base, ["ano", "nome_classe"])
+    variacao_municipio = variacao(municipio_ano, ["NM_MUN", "nome_classe"], anos_referencia)
+    variacao_estado = variacao(estado_ano, ["SIGLA_UF", "nome_classe"], anos_referencia)
+
+    chaves = base.index.to_frame(index=False)
+    # Perda de vegetação nativa de todos os municípios, por (município, UF): homônimos ficam separados no ranking
+    niveis_municipio = ["NM_MUN", "SIGLA_UF"]
+    perda_municipio = perda_vegetacao_nativa(variacao(base, niveis_municipio + ["nome_classe"], anos_referencia),
+                                             niveis_municipio, anos_referencia)
+
+    return {
+        "anos_referencia": anos_referencia,
+        "municipio_ano": municipio_ano,
+        "estado_ano": estado_ano,
+        "total_ano": total_ano,
+        "municipio_decada": somar(base_decada, ["NM_MUN", "decada", "nome_classe"]),
+        "estado_decada": somar(base_decada, ["SIGLA_UF", "decada", "nome_classe"]),
+        "total_decada": somar(base_decada, ["decada", "nome_classe"]),
+        # Anos com dados em cada década (as das pontas são incompletas, ex.: 1985–1989 e 2020–2023)
+        "anos_decada": pd.Series(anos.unique() // 10 * 10).value_counts().rename_axis("decada").sort_index(),
+        "variacao_municipio": variacao_municipio,
+        "variacao_estado": variacao_estado,
+        "variacao_total": variacao(total_ano, ["nome_classe"], anos_referencia),
+        "antropizacao_municipio": antropizacao(municipio_ano, ["NM_MUN", "ano"]),
+        "antropizacao_estado": antropizacao(estado_ano, ["SIGLA_UF", "ano"]),
+        "antropizacao_total": antropizacao(total_ano, ["ano"]),
+        "perda_municipio": perda_municipio,
+        "perda_estado": perda_vegetacao_nativa(variacao_estado, "SIGLA_UF", anos_referencia),
+        # Sobre a base, em que cada homônimo continua sendo uma observação separada (como nas linhas dos dados)
+        "momentos_ano": momentos(base, ["ano", "nome_classe"]),
+        "municipios_estado": chaves.groupby("SIGLA_UF", observed=True)["NM_MUN"].nunique(),
+        "diversidade_estado": chaves.groupby(["SIGLA_UF", "ano"], observed=True)["nome_classe"].nunique(),
+    }
+
+
+@st.cache_resource(show_spinner=False, max_entries=256)
+def _base_particao(caminho, versao):
+    return base_cubo(_ler_particao(caminho, versao))
+
+
+@st.cache_resource(show_spinner="Calculando agregados...", max_entries=2)
+def _carregar_cubo(caminho, versao):
+    if os.path.isdir(caminho):
+        # Só as partições novas ou regravadas são agregadas de novo
+        return montar_cubo(juntar_bases([_base_particao(p, versao_arquivo(p)) for p in listar_particoes(caminho).values()]))
+    return construir_cubo(_carregar_dados(caminho, versao))
+
+
+def carregar_cubo(caminho=None):
+    # Recalculado apenas quando os dados de origem mudam
+    caminho = caminho or fonte_dados()
+    return _carregar_cubo(caminho, versao_arquivo(caminho))
+
+
+def fatia_anual(cubo, cidade, intervalo_anos, classes):
+    # Série (ano, nome_classe) -> área para um município ou para todos
+    if cidade == "Todos":
+        serie = cubo["total_ano"]
+    else:
+        serie = cubo["municipio_ano"].loc[cidade]
+    serie = serie.loc[intervalo_anos[0]:intervalo_anos[1]]
+    return serie[serie.index.get_level_values("nome_classe").isin(classes)]
+
+
+def fatia_decada(cubo, cidade, intervalo_anos, classes):
+    anos = cubo["total_ano"].index.get_level_values("ano")
+    if intervalo_anos[0] <= anos.min() and intervalo_anos[1] >= anos.max():
+        if cidade == "Todos":
+            serie = cubo["total_decada"]
+        else:
+            serie = cubo["municipio_decada"].loc[cidade]
+        return serie[serie.index.get_level_values("nome_classe").isin(classes)]
+
+    # Intervalo parcial: reagrupa a fatia anual, que já é pequena
+    serie = fatia_anual(cubo, cidade, intervalo_anos, classes)
+    decada = pd.Index((serie.index.get_level_values("ano") // 10) * 10, name="decada")
+    return serie.groupby([decada, serie.index.get_level_values("nome_classe")], observed=True).sum()
+
+
+def variacao_classes(cubo, cidade):
+    if cidade == "Todos":
+        return cubo["variacao_total"]
+    return cubo["variacao_municipio"].loc[cidade]
+
+
+def comparar_anos(serie, ano_comp1, ano_comp2):
+    # Áreas por classe em dois anos de uma série (ano, nome_classe), com as variações
+    df_classes_ano = serie.unstack("ano")
+    df_ano1 = df_classes_ano[ano_comp1] if ano_comp1 in df_classes_ano else pd.Series(dtype=float)
+    df_ano2 = df_classes_ano[ano_comp2] if ano_comp2 in df_classes_ano else pd.Series(dtype=float)
+
+    df_diff = pd.DataFrame({"Ano 1": df_ano1, "Ano 2": df_ano2})
+    df_diff.index.name = "nome_classe"
+    df_diff["Variação Absoluta"] = df_diff["Ano 2"] - df_diff["Ano 1"]
+    df_diff["Variação Percentual"] = ((df_diff["Ano 2"] - df_diff["Ano 1"]) / df_diff["Ano 1"]) * 100
+    return df_diff.fillna(0)
+
+
+def perda_municipios(cubo, municipios):
+    # Perda por nome de município, com homônimos somados como nas séries de municipio_ano
+    df_var = cubo["variacao_municipio"]
+    df_var = df_var[df_var.index.get_level_values("NM_MUN").isin(municipios)]
+    return perda_vegetacao_nativa(df_var, "NM_MUN", cubo["anos_referencia"])
+
+
+def comparar_municipios(cubo, municipios, intervalo_anos, classes):
+    # Séries, alerta de perda de vegetação nativa e antropização de vários municípios numa só passada pelo cubo
+    serie = cubo["municipio_ano"]
+    anos = serie.index.get_level_values("ano")
+    mascara = (serie.index.get_level_values("NM_MUN").isin(municipios)
+               & (anos >= intervalo_anos[0]) & (anos <= intervalo_anos[1])
+               & serie.index.get_level_values("nome_classe").isin(classes))
+    serie = serie[mascara]
+
+    return {
+        "serie": serie,
+        "perda": perda_municipios(cubo, municipios),
+        "df_idx": antropizacao(serie, ["NM_MUN", "ano"]),
+    }
+
+
+def alertas_perda(cubo, limite=LIMITE_PERDA_NATIVA):
+    # Municípios acima do limite de perda, da maior para a menor, e o resumo por estado
+    perda = cubo["perda_municipio"]
+    criticos = perda[perda["perda_percentual"] > limite].sort_values("perda_percentual", ascending=False)
+    estados = cubo["perda_estado"].copy()
+    estados["municipios_criticos"] = criticos.groupby("SIGLA_UF", observed=True).size().reindex(estados.index, fill_value=0)
+    estados["municipios"] = cubo["municipios_estado"].reindex(estados.index)
+    return criticos, estados.sort_values("perda_percentual", ascending=False)
+
+
+def indicadores_estados(cubo, estados=None):
+    # Indicadores da aba "Análises por Estados" (painel e publicacao.py); estados=None usa todas as UFs
+    def por_estado(tabela):
+        if estados is None:
+            return tabela
+        return tabela[tabela.index.get_level_values("SIGLA_UF").isin(estados)]
+
+    resultado = {}
+
+    # 1. Quantidade de municípios por estado
+    resultado["df_mun"] = por_estado(cubo["municipios_estado"]).reset_index(name="Quantidade de Municípios")
+
+    # 2. Perda de vegetação nativa por estado
+    df_var_estado = por_estado(cubo["variacao_estado"])
+    df_nat_pivot = df_var_estado[df_var_estado.index.get_level_values("nome_classe").isin(vegetacao_nativa)]
+    resultado["df_nat_agg"] = df_nat_pivot.groupby("SIGLA_UF", observed=True)["variação"].sum().reset_index()
+
+    # 3. Evolução da cobertura agrícola por estado
+    df_agro_pivot = df_var_estado[df_var_estado.index.get_level_values("nome_classe").isin(agricolas)]
+    resultado["df_agro"] = df_agro_pivot.rename(columns={"variação": "crescimento"}).reset_index()
+
+    # 4. Urbanização por estado
+    df_estado_ano = por_estado(cubo["estado_ano"])
+    resultado["df_urb_agg"] = df_estado_ano[df_estado_ano.index.get_level_values("nome_classe") == "Área Urbana"].droplevel("nome_classe").reset_index()
+
+    # 5. Índice médio de antropização por estado
+    resultado["df_idx"] = por_estado(cubo["antropizacao_estado"]).reset_index()
+
+    # 6. Diversidade de classes por estado
+    resultado["df_div"] = por_estado(cubo["diversidade_estado"]).reset_index(name="n_classes")
+
+    # 7. Década de maior alteração por estado (a década em que ocorre o máximo), comparando a área média
+    # anual de cada década: as somas por década cobrem números de anos diferentes
+    estado_decada = por_estado(cubo["estado_decada"])
+    anos_decada = cubo["anos_decada"].reindex(estado_decada.index.get_level_values("decada")).to_numpy()
+    resultado["df_alt_max"] = maior_mudanca(densificar(estado_decada / anos_decada, "SIGLA_UF", "decada")).reset_index()
+    return resultado
+
+
+def momentos_filtrados(cubo, cidade, intervalo_anos, classes):
+    if cidade == "Todos":
+        tabela = cubo["momentos_ano"].loc[intervalo_anos[0]:intervalo_anos[1]]
+        return tabela[tabela.index.get_level_values("nome_classe").isin(classes)]
+    # Um município tem poucas linhas: os momentos saem delas, com homônimos como observações separadas (como nas linhas filtradas)
+    motor = carregar_motor()
+    linhas = motor.df.iloc[motor.posicoes(cidade, intervalo_anos, classes)]
+    return momentos(linhas.set_index(["ano", "nome_classe"])["area_ha"], ["ano", "nome_classe"])
+
+
+def frequencias(contagens):
+    # count/unique/top/freq de uma coluna categórica, como no describe, a partir das linhas por categoria
+    contagens = contagens[contagens > 0]
+    return {"count": contagens.sum(), "unique": len(contagens), "top": contagens.idxmax(), "freq": contagens.max()}
+
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def estatisticas_descritivas(versao, cidade, intervalo_anos, classes):
+    # Resumo dos dados filtrados (as colunas do describe, sem os quartis) a partir dos momentos por
+    # (ano, classe) e das contagens de município e UF, sem materializar as linhas
+    m = momentos_filtrados(carregar_cubo(), cidade, intervalo_anos, classes)
+    n = m["n"].sum()
+    if n == 0:
+        return pd.DataFrame()
+
+    def resumo(n_grupo, media, m2, minimo, maximo):
+        desvio = (m2 / (n_grupo - 1)) ** 0.5 if n_grupo > 1 else float("nan")
+        return {"count": n_grupo, "mean": round(media, 2), "std": round(desvio, 2), "min": round(minimo, 2), "max": round(maximo, 2)}
+
+    def resumo_constante(valores):
+        # Colunas constantes dentro de um grupo (ano, classe): média = valor do grupo e m2 = 0
+        valores = pd.Series(valores.to_numpy(dtype="float64"), index=m.index)
+        return resumo(*combinar_momentos(m["n"], valores, pd.Series(0.0, index=m.index)), valores.min(), valores.max())
+
+    anos = m.index.get_level_values("ano")
+    nomes_classe = m.index.get_level_values("nome_classe")
+    codigos_classe = nomes_classe.map(legenda_df.set_index("nome_classe")["classe_cobertura"])
+    por_classe = m["n"].groupby(level="nome_classe", observed=True).sum()
+    motor = carregar_motor()
+    tabela = pd.DataFrame({
+        "NM_MUN": frequencias(motor.contagens(cidade, intervalo_anos, classes, "NM_MUN")),
+        "SIGLA_UF": frequencias(motor.contagens(cidade, intervalo_anos, classes, "SIGLA_UF")),
+        "ano": resumo_constante(anos),
+        "classe_cobertura": resumo_constante(codigos_classe),
+        "area_ha": resumo(*combinar_momentos(m["n"], m["media"], m["m2"]), m["minimo"].min(), m["maximo"].max()),
+        "decada": resumo_constante(anos // 10 * 10),
+        "nome_classe": frequencias(por_classe),
+        "cor_rgb": frequencias(por_classe.groupby(por_classe.index.astype(str).map(mapa_cores)).sum()),
+    }).reindex(["count", "unique", "top", "freq", "mean", "std", "min", "max"])
+    # Texto uniforme para a exibição (colunas mistas não são serializáveis em Arrow)
+    return tabela.astype(object).where(tabela.notna(), "").astype(str)
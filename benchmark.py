@@ -0,0 +1,237 @@
+# Benchmark do painel sem navegador: gera dados sintéticos a partir do histórico (10× e 100× mais
+# municípios), executa o app.py com o AppTest do Streamlit em várias combinações de filtros e
+# relata o tempo e o pico de memória de cada seção medida com desempenho.medir.
+#   python benchmark.py                                  # escala 10
+#   python benchmark.py --escalas 100                    # ~25 min; ver abaixo
+#   python benchmark.py --escalas 10 --saida base.json   # guarda o resultado
+#   python benchmark.py --escalas 10 --comparar base.json --tolerancia 0.25
+# Com --comparar, termina com código 1 se alguma seção ficar mais lenta que a base além da tolerância.
+# Antes da primeira sessão os caches são pré-aquecidos como no iniciar.py; a primeira sessão deve
+# ficar abaixo da meta de partida (--meta-partida), senão o benchmark também termina com código 1.
+# A escala 100 fica fora do padrão: completa com ~2,5 GB de pico, mas numa máquina de 1 CPU e 6 GB a
+# primeira sessão leva ~2,6 s e não atinge a meta de 2 s (código 1 esperado nessa configuração).
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from dados import base_dir, carregar_dados, fonte_dados
+
+# Combinações de filtros exercitadas em cada escala
+CLASSES_REDUZIDAS = ["Formação Florestal", "Pastagem", "Soja"]
+ANOS_INTERVALO_CURTO = 5
+# Seções abaixo deste tempo na base não entram na comparação (ruído)
+TEMPO_MINIMO_COMPARACAO_MS = 50
+TEMPO_LIMITE_EXECUCAO_S = 1800
+# Tempo máximo da primeira sessão depois do pré-aquecimento
+META_PRIMEIRA_SESSAO_MS = 2000
+
+
+def gerar_sintetico(df, escala, diretorio, semente=0):
+    # Replica os municípios `escala` vezes (cópias com sufixo no nome e áreas perturbadas) e grava
+    # as partições anuais, um ano por vez; a primeira cópia mantém os nomes reais, que têm coordenadas no mapa
+    from ingestao import gravar_particao
+
+    nomes = df["NM_MUN"].cat.categories
+    copias = np.arange(escala)
+    categorias = [str(nome) if k == 0 else f"{nome} ({k + 1})" for k in copias for nome in nomes]
+    fator = np.random.default_rng(semente).uniform(0.8, 1.2, size=(escala, len(nomes))).astype("float32")
+
+    linhas = 0
+    for ano, df_ano in df.groupby("ano", sort=True):
+        codigos = df_ano["NM_MUN"].cat.codes.to_numpy()
+        sintetico = pd.DataFrame({coluna: np.tile(df_ano[coluna].to_numpy(), escala) for coluna in df.columns if coluna != "NM_MUN"})
+        sintetico["NM_MUN"] = pd.Categorical.from_codes((copias[:, None] * len(nomes) + codigos).ravel(), categories=categorias)
+        sintetico["area_ha"] = sintetico["area_ha"] * fator[np.repeat(copias, len(df_ano)), np.tile(codigos, escala)]
+        for coluna in ("SIGLA_UF", "nome_classe", "cor_rgb"):
+            sintetico[coluna] = sintetico[coluna].astype(df[coluna].dtype)
+        gravar_particao(sintetico[df.columns], int(ano), diretorio)
+        linhas += len(sintetico)
+    return linhas
+
+
+def combinacoes(municipio, classes, anos):
+    curto = (max(anos) - ANOS_INTERVALO_CURTO + 1, max(anos))
+    reduzidas = [c for c in CLASSES_REDUZIDAS if c in classes]
+    for cidade in ("Todos", municipio):
+        for nome_classes, selecao in (("todas as classes", classes), (f"{len(reduzidas)} classes", reduzidas)):
+            for nome_anos, intervalo in (("todos os anos", (min(anos), max(anos))), (f"{curto[0]}-{curto[1]}", curto)):
+                yield f"{cidade} | {nome_classes} | {nome_anos}", cidade, selecao, intervalo
+
+
+def widget(lista, rotulo):
+    return next(w for w in lista if w.label == rotulo)
+
+
+def executar(at):
+    import desempenho
+
+    at.run(timeout=TEMPO_LIMITE_EXECUCAO_S)
+    if at.exception:
+        raise RuntimeError(at.exception[0].message)
+    return desempenho.ultima_execucao()
+
+
+def medir_escala(escala, origem, municipio, memoria, preaquecimento, resultado):
+    # Executado em um processo separado por escala, com HISTORICO_DIR apontando para os dados sintéticos.
+    # Cada execução é acrescentada ao arquivo de resultado assim que termina: se o processo for
+    # encerrado por falta de memória, o que já foi medido não se perde.
+    import desempenho
+    import exportacao
+    from dados import versao_dados
+    from filtros import carregar_motor
+    from streamlit.testing.v1 import AppTest
+
+    df = carregar_dados(origem)
+    municipio = municipio or str(df["NM_MUN"].cat.categories[0])
+    linhas = gerar_sintetico(df, escala, os.path.join(os.environ["HISTORICO_DIR"], "particoes"))
+    classes = sorted(df["nome_classe"].unique())
+    anos = sorted(int(a) for a in df["ano"].unique())
+    del df
+    exportacao.exportacoes_dir = os.path.join(os.environ["HISTORICO_DIR"], "exportacoes")
+    desempenho.medir_memoria(memoria)
+
+    def registrar(combinacao, fase, medicoes):
+        pico_processo_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        with open(resultado, "a", encoding="utf-8") as f:
+            for m in medicoes:
+                f.write(json.dumps({"escala": escala, "linhas": linhas, "combinacao": combinacao, "fase": fase, **m,
+                                    "pico_processo_mb": round(pico_processo_mb, 1)}, ensure_ascii=False) + "\n")
+
+    if preaquecimento:
+        from iniciar import preaquecer
+
+        registrar("pré-aquecimento", "frio", preaquecer())
+    at = AppTest.from_file(os.path.join(base_dir, "app.py"), default_timeout=TEMPO_LIMITE_EXECUCAO_S)
+    registrar("primeira sessão", "frio", executar(at))
+    # Todas as abas em cada execução, para medir todas as seções
+    widget(at.sidebar.toggle, "Calcular apenas a análise ativa").set_value(False)
+    for nome, cidade, selecao, intervalo in combinacoes(municipio, classes, anos):
+        widget(at.sidebar.selectbox, "Escolha um município:").set_value(cidade)
+        widget(at.sidebar.multiselect, "Filtrar por classe de cobertura (opcional):").set_value(selecao)
+        widget(at.sidebar.slider, "Selecione o intervalo de anos:").set_value(intervalo)
+        # Primeira execução com os caches da combinação vazios, a segunda com eles preenchidos
+        registrar(nome, "frio", executar(at))
+        registrar(nome, "quente", executar(at))
+        # A exportação só roda no clique do botão; aqui é chamada diretamente
+        desempenho.iniciar_execucao()
+        with desempenho.medir("exportação"):
+            exportacao.gerar_exportacao(carregar_motor(), versao_dados(), cidade, intervalo, selecao, "CSV")
+        registrar(nome, "frio", desempenho.medicoes())
+
+
+def rodar_escala(escala, origem, municipio, memoria, preaquecimento):
+    # (registros, código de saída do processo); código negativo = encerrado por sinal (ex.: SIGKILL por falta de memória)
+    with tempfile.TemporaryDirectory(prefix=f"benchmark-{escala}x-") as diretorio:
+        resultado = os.path.join(diretorio, "resultado.jsonl")
+        comando = [sys.executable, os.path.abspath(__file__), "--interno", str(escala), "--origem", origem, "--resultado", resultado]
+        if municipio:
+            comando += ["--municipio", municipio]
+        if not memoria:
+            comando.append("--sem-memoria")
+        if not preaquecimento:
+            comando.append("--sem-preaquecimento")
+        codigo = subprocess.run(comando, env={**os.environ, "HISTORICO_DIR": diretorio}).returncode
+        try:
+            with open(resultado, encoding="utf-8") as f:
+                return [json.loads(linha) for linha in f], codigo
+        except FileNotFoundError:
+            return [], codigo
+
+
+def tabela(registros):
+    registros = pd.DataFrame(registros, columns=["escala", "combinacao", "fase", "secao", "nivel", "ms", "pico_mb"])
+    return registros.astype({"ms": "float64", "pico_mb": "float64"})
+
+
+def resumo(registros):
+    # Por escala, fase e seção: tempo médio e máximo entre as combinações e o maior pico de memória
+    return (registros.groupby(["escala", "fase", "secao"], sort=False)
+            .agg(execucoes=("ms", "size"), ms_medio=("ms", "mean"), ms_max=("ms", "max"), pico_mb=("pico_mb", "max"))
+            .round(1)
+            .sort_index(level=["escala", "fase"], sort_remaining=False))
+
+
+def regressoes(atual, base, tolerancia):
+    chaves = ["escala", "combinacao", "fase", "secao"]
+    base = base.groupby(chaves)["ms"].sum()
+    atual = atual.groupby(chaves)["ms"].sum()
+    juntos = pd.DataFrame({"base_ms": base, "atual_ms": atual}).dropna()
+    juntos = juntos[juntos["base_ms"] >= TEMPO_MINIMO_COMPARACAO_MS]
+    juntos["variacao"] = juntos["atual_ms"] / juntos["base_ms"] - 1
+    return juntos[juntos["variacao"] > tolerancia].sort_values("variacao", ascending=False)
+
+
+def partida(registros, meta_ms):
+    # Tempo total da primeira sessão de cada escala e se ficou dentro da meta
+    primeira = registros[(registros["combinacao"] == "primeira sessão") & (registros["secao"] == "total")]
+    tempos = primeira.set_index("escala")["ms"].to_frame("primeira_sessao_ms")
+    tempos["dentro_da_meta"] = tempos["primeira_sessao_ms"] <= meta_ms
+    return tempos
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mede tempo e memória de cada seção do painel com dados sintéticos.")
+    parser.add_argument("--escalas", type=int, nargs="+", default=[10], help="Multiplicadores do número de municípios")
+    parser.add_argument("--municipio", help="Município usado nas combinações de um único município (padrão: o primeiro)")
+    parser.add_argument("--sem-memoria", action="store_true", help="Não mede o pico de memória (tracemalloc deixa tudo mais lento)")
+    parser.add_argument("--sem-preaquecimento", action="store_true", help="Mede a primeira sessão sem o pré-aquecimento do iniciar.py")
+    parser.add_argument("--meta-partida", type=float, default=META_PRIMEIRA_SESSAO_MS, help="Tempo máximo (ms) da primeira sessão")
+    parser.add_argument("--saida", help="Grava os resultados em JSON")
+    parser.add_argument("--comparar", help="JSON de uma execução anterior usado como base")
+    parser.add_argument("--tolerancia", type=float, default=0.25, help="Aumento relativo de tempo aceito na comparação")
+    parser.add_argument("--interno", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--origem", help=argparse.SUPPRESS)
+    parser.add_argument("--resultado", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.interno:
+        medir_escala(args.interno, args.origem, args.municipio, not args.sem_memoria, not args.sem_preaquecimento, args.resultado)
+        return
+
+    todos, falhas = [], []
+    for escala in args.escalas:
+        print(f"Escala {escala}×...", flush=True)
+        registros, codigo = rodar_escala(escala, fonte_dados(), args.municipio, not args.sem_memoria, not args.sem_preaquecimento)
+        todos.extend(registros)
+        ultimo = registros[-1] if registros else {}
+        situacao = "concluída" if codigo == 0 else f"interrompida (código {codigo}) após {len(registros)} medições"
+        print(f"  {situacao}; {ultimo.get('linhas', '?')} linhas, pico do processo {ultimo.get('pico_processo_mb', '?')} MB",
+              flush=True)
+        if codigo != 0:
+            falhas.append(escala)
+
+    registros = tabela(todos)
+    with pd.option_context("display.max_rows", None, "display.width", 200):
+        print(resumo(registros).to_string())
+    metas = partida(registros, args.meta_partida)
+    print(f"\nPrimeira sessão (meta: {args.meta_partida:g} ms):")
+    print(metas.to_string())
+
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as f:
+            json.dump({"registros": todos, "falhas": falhas}, f, ensure_ascii=False, indent=1)
+
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as f:
+            base = tabela(json.load(f)["registros"])
+        piores = regressoes(registros, base, args.tolerancia)
+        if not piores.empty:
+            print(f"\nSeções mais de {args.tolerancia:.0%} mais lentas que a base:")
+            print(piores.round(3).to_string())
+            sys.exit(1)
+        print("\nSem regressões em relação à base.")
+    if falhas:
+        sys.exit(f"Escalas interrompidas: {', '.join(map(str, falhas))}")
+    if not metas["dentro_da_meta"].all():
+        sys.exit("Primeira sessão acima da meta de partida")
+
+
+if __name__ == "__main__":
+    main()
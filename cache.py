@@ -0,0 +1,29 @@
+import threading
+from collections import OrderedDict
+
+
+class CacheLRU:
+    # LRU de conteúdos serializados (bytes ou texto), limitado pelo tamanho total
+
+    def __init__(self, limite_bytes):
+        self.limite_bytes = limite_bytes
+        self.total_bytes = 0
+        self._itens = OrderedDict()
+        self._trava = threading.Lock()
+
+    def obter(self, chave):
+        with self._trava:
+            if chave not in self._itens:
+                return None
+            self._itens.move_to_end(chave)
+            return self._itens[chave]
+
+    def guardar(self, chave, conteudo):
+        with self._trava:
+            if chave in self._itens:
+                self.total_bytes -= len(self._itens.pop(chave))
+            self._itens[chave] = conteudo
+            self.total_bytes += len(conteudo)
+            while self.total_bytes > self.limite_bytes and len(self._itens) > 1:
+                _, removido = self._itens.popitem(last=False)
+                self.total_bytes -= len(removido)
@@ -0,0 +1,207 @@
+import hashlib
+import inspect
+import json
+import os
+import re
+import pandas as pd
+import streamlit as st
+
+base_dir = os.path.dirname(os.path.abspath(__file__))
+# HISTORICO_DIR aponta para outra pasta de dados (usado pelo benchmark.py)
+historico_dir = os.environ.get("HISTORICO_DIR") or os.path.join(base_dir, "historico")
+csv_path = os.path.join(historico_dir, "estatisticas_coverage_historico.csv")
+# Armazenamento particionado: um arquivo Parquet por ano (ver ingestao.py)
+particoes_dir = os.path.join(historico_dir, "particoes")
+
+# Legenda MapBiomas
+cores_mapbiomas = {
+    3:  ("Formação Florestal", "#006400"),
+    4:  ("Formação Savânica", "#DAA520"),
+    5:  ("Mangue", "#8B4513"),
+    6:  ("Floresta Alagável", "#00BFFF"),
+    9:  ("Silvicultura", "#A52A2A"),
+    11: ("Área Úmida Natural", "#B0C4DE"),
+    12: ("Campo Natural", "#D2B48C"),
+    15: ("Pastagem", "#F5DEB3"),
+    18: ("Agricultura (Outros)", "#F4A460"),
+    19: ("Lavoura Temporária", "#FFA500"),
+    20: ("Cana-de-açúcar", "#B22222"),
+    21: ("Mosaico de Usos", "#FFDEAD"),
+    23: ("Praia e Duna", "#EEE8AA"),
+    24: ("Área Urbana", "#FF0000"),
+    25: ("Outras Áreas Não Vegetadas", "#8B0000"),
+    29: ("Afloramento Rochoso", "#A9A9A9"),
+    30: ("Mineração", "#808000"),
+    31: ("Aquicultura", "#1E90FF"),
+    39: ("Soja", "#FFA07A")
+}
+legenda_df = pd.DataFrame([
+    {"classe_cobertura": k, "nome_classe": v[0], "cor_rgb": v[1]}
+    for k, v in cores_mapbiomas.items()
+])
+mapa_cores = dict(zip(legenda_df["nome_classe"], legenda_df["cor_rgb"]))
+
+# Grupos de classes por código da legenda (uma classe pode estar em mais de um grupo)
+grupos_mapbiomas = {
+    "vegetacao_nativa": [3, 4],
+    "antropica": [15, 18, 20, 24, 30, 39],
+    "agricola": [15, 18, 20, 39],
+}
+grupos_legenda = pd.DataFrame(
+    {grupo: legenda_df["classe_cobertura"].isin(codigos).to_numpy() for grupo, codigos in grupos_mapbiomas.items()},
+    index=pd.Index(legenda_df["classe_cobertura"])
+)
+grupos_legenda["natural"] = ~grupos_legenda["antropica"]
+grupos_legenda.insert(0, "nome_classe", legenda_df["nome_classe"].to_numpy())
+
+
+def classes_do_grupo(grupo):
+    return grupos_legenda.loc[grupos_legenda[grupo], "nome_classe"].tolist()
+
+
+def rotulos_grupo(grupo, sim, nao):
+    # Classe -> rótulo conforme pertence ou não ao grupo, para mapear índices categóricos
+    return pd.Series(grupos_legenda[grupo].map({True: sim, False: nao}).to_numpy(), index=grupos_legenda["nome_classe"])
+
+colunas_categoricas = ["NM_MUN", "SIGLA_UF", "nome_classe", "cor_rgb"]
+
+
+def caminho_particao(ano, diretorio=particoes_dir):
+    return os.path.join(diretorio, f"ano={ano}.parquet")
+
+
+def listar_particoes(diretorio=particoes_dir):
+    # {ano: caminho} das partições existentes, em ordem de ano
+    try:
+        entradas = list(os.scandir(diretorio))
+    except OSError:
+        return {}
+    particoes = {}
+    for entrada in entradas:
+        achado = re.fullmatch(r"ano=(\d{4})\.parquet", entrada.name)
+        if achado and entrada.is_file():
+            particoes[int(achado.group(1))] = entrada.path
+    return dict(sorted(particoes.items()))
+
+
+def fonte_dados():
+    # Usa o armazenamento particionado quando existir; senão o CSV único
+    return particoes_dir if listar_particoes() else csv_path
+
+
+def versao_arquivo(caminho):
+    if os.path.isdir(caminho):
+        # Diretório de partições: muda quando um ano é incluído ou regravado
+        versoes = [f"{ano}:{versao_arquivo(p)}" for ano, p in listar_particoes(caminho).items()]
+        return hashlib.sha1("|".join(versoes).encode("utf-8")).hexdigest()[:16]
+    # Identifica a versão do arquivo pela data de modificação e tamanho
+    info = os.stat(caminho)
+    return f"{info.st_mtime_ns}-{info.st_size}"
+
+
+def versao_dados():
+    return versao_arquivo(fonte_dados())
+
+
+def caminho_sidecar(caminho):
+    return os.path.splitext(caminho)[0] + ".parquet"
+
+
+def otimizar_tipos(df):
+    for coluna in colunas_categoricas:
+        if coluna in df.columns:
+            df[coluna] = df[coluna].astype("category").cat.remove_unused_categories()
+    for coluna in df.select_dtypes(include="integer").columns:
+        df[coluna] = pd.to_numeric(df[coluna], downcast="integer")
+    for coluna in df.select_dtypes(include="float").columns:
+        df[coluna] = pd.to_numeric(df[coluna], downcast="float")
+    return df
+
+
+def ler_csv(caminho):
+    df = pd.read_csv(caminho, sep=";", decimal=",")
+    df["decada"] = (df["ano"] // 10) * 10
+    df = df.merge(legenda_df, on="classe_cobertura", how="left")
+    df = df.dropna(subset=["nome_classe"])
+    df = otimizar_tipos(df)
+    # Ordem canônica usada pelos índices do filtro (ver filtros.py)
+    return df.sort_values(["NM_MUN", "ano", "nome_classe"], kind="stable").reset_index(drop=True)
+
+
+def assinatura_sidecar():
+    # Muda quando a legenda, as colunas categóricas ou o código de conversão do CSV mudam;
+    # gravada nos metadados do Parquet para invalidar cópias feitas com outra versão
+    partes = [json.dumps(cores_mapbiomas, ensure_ascii=False, sort_keys=True), ",".join(colunas_categoricas)]
+    for funcao in (ler_csv, otimizar_tipos):
+        try:
+            partes.append(inspect.getsource(funcao))
+        except (OSError, TypeError):
+            partes.append(funcao.__code__.co_code.hex())
+    return hashlib.sha1("\n".join(partes).encode("utf-8")).hexdigest()
+
+
+def ler_sidecar(caminho):
+    # Usa o arquivo colunar somente se ele for mais novo que o CSV de origem e tiver a assinatura atual
+    sidecar = caminho_sidecar(caminho)
+    try:
+        import pyarrow.parquet as pq
+
+        if os.stat(sidecar).st_mtime_ns < os.stat(caminho).st_mtime_ns:
+            return None
+        metadados = pq.read_schema(sidecar).metadata or {}
+        if metadados.get(b"assinatura") != assinatura_sidecar().encode("ascii"):
+            return None
+        return pd.read_parquet(sidecar)
+    except (OSError, ImportError, ValueError):
+        return None
+
+
+def gravar_sidecar(df, caminho):
+    sidecar = caminho_sidecar(caminho)
+    temporario = f"{sidecar}.{os.getpid()}.tmp"
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        tabela = pa.Table.from_pandas(df, preserve_index=False)
+        tabela = tabela.replace_schema_metadata({**(tabela.schema.metadata or {}), b"assinatura": assinatura_sidecar().encode("ascii")})
+        pq.write_table(tabela, temporario)
+        os.replace(temporario, sidecar)
+    except (OSError, ImportError, ValueError):
+        # Sem pyarrow ou sem permissão de escrita: segue apenas com o CSV
+        if os.path.exists(temporario):
+            os.remove(temporario)
+
+
+@st.cache_resource(show_spinner=False, max_entries=256)
+def _ler_particao(caminho, versao):
+    return pd.read_parquet(caminho)
+
+
+def ler_particoes(diretorio):
+    # Cada ano fica em cache pela sua versão: um ano novo não relê os anteriores
+    return [_ler_particao(p, versao_arquivo(p)) for p in listar_particoes(diretorio).values()]
+
+
+def juntar_particoes(partes):
+    df = pd.concat(partes, ignore_index=True)
+    # Categorias refeitas em ordem alfabética, como na leitura do CSV único
+    df = otimizar_tipos(df)
+    return df.sort_values(["NM_MUN", "ano", "nome_classe"], kind="stable").reset_index(drop=True)
+
+
+@st.cache_resource(show_spinner="Carregando dados...", max_entries=2)
+def _carregar_dados(caminho, versao):
+    if os.path.isdir(caminho):
+        return juntar_particoes(ler_particoes(caminho))
+    df = ler_sidecar(caminho)
+    if df is None:
+        df = ler_csv(caminho)
+        gravar_sidecar(df, caminho)
+    return df
+
+
+def carregar_dados(caminho=None):
+    # O DataFrame retornado é compartilhado entre sessões e não deve ser alterado
+    caminho = caminho or fonte_dados()
+    return _carregar_dados(caminho, versao_arquivo(caminho))
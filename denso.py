@@ -0,0 +1,116 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from dados import _carregar_dados, base_dir, fonte_dados, versao_arquivo
+from mudancas import Tensor
+
+denso_dir = os.path.join(base_dir, ".cache", "denso")
+# Com ARMAZENAMENTO_DENSO=1 o modo de comparação lê o ano de maior alteração deste armazenamento
+USAR_DENSO = os.environ.get("ARMAZENAMENTO_DENSO") == "1"
+
+
+class ArmazenamentoDenso:
+    # Áreas em float32 município × ano × classe, com mapas de índice pequenos e a UF de cada município.
+    # Os municípios ficam ordenados por (UF, nome): homônimos em UFs diferentes são entradas distintas.
+
+    def __init__(self, valores, municipios, ufs, codigos_uf, anos, classes):
+        self.valores = valores
+        self.municipios = pd.Index(municipios, name="NM_MUN")
+        self.ufs = pd.Index(ufs, name="SIGLA_UF")
+        self.codigos_uf = np.asarray(codigos_uf, dtype=np.int8)
+        self.anos = pd.Index(np.asarray(anos, dtype=np.int16), name="ano")
+        self.classes = pd.Index(classes, name="nome_classe")
+        self.indice_classe = {nome: i for i, nome in enumerate(self.classes)}
+
+    @classmethod
+    def de_dataframe(cls, df):
+        entidades, pares = pd.MultiIndex.from_arrays([df["SIGLA_UF"], df["NM_MUN"]]).factorize(sort=True)
+        cod_ano, anos = pd.factorize(df["ano"], sort=True)
+        cod_classe, classes = pd.factorize(df["nome_classe"], sort=True)
+        forma = (len(pares), len(anos), len(classes))
+        posicoes = np.ravel_multi_index((entidades, cod_ano, cod_classe), forma)
+        # Soma em float64 e guarda em float32
+        valores = np.bincount(posicoes, weights=df["area_ha"].to_numpy(dtype="float64"), minlength=int(np.prod(forma)))
+        cod_uf, ufs = pd.factorize(pares.get_level_values(0), sort=True)
+        return cls(valores.reshape(forma).astype(np.float32), pares.get_level_values(1).astype(str), ufs.astype(str),
+                   cod_uf, anos, classes.astype(str))
+
+    def tensor_municipios(self, nomes, intervalo_anos, classes):
+        # Tensor dos municípios pedidos no intervalo e nas classes, com homônimos somados como em municipio_ano
+        posicoes = np.flatnonzero(self.municipios.isin(nomes))
+        inicio = self.anos.searchsorted(intervalo_anos[0], side="left")
+        fim = self.anos.searchsorted(intervalo_anos[1], side="right")
+        colunas = [self.indice_classe[nome] for nome in sorted(classes) if nome in self.indice_classe]
+        codigos, rotulos = pd.factorize(self.municipios[posicoes], sort=True)
+        valores = np.zeros((len(rotulos), fim - inicio, len(colunas)))
+        np.add.at(valores, codigos, self.valores[posicoes, inicio:fim][:, :, colunas])
+        return Tensor(valores, pd.Index(rotulos, name="NM_MUN"), self.anos[inicio:fim], self.classes[colunas])
+
+    def salvar(self, caminho):
+        # Array em .npy (pode ser aberto com memmap) e índices em um JSON ao lado
+        # Temporários por processo: duas sessões podem gravar a mesma versão ao mesmo tempo
+        temporario = f"{caminho}.{os.getpid()}.tmp"
+        temporario_indices = f"{caminho_indices(caminho)}.{os.getpid()}.tmp"
+        with open(temporario, "wb") as f:
+            np.save(f, self.valores)
+        indices = {
+            "municipios": list(self.municipios), "ufs": list(self.ufs), "codigos_uf": self.codigos_uf.tolist(),
+            "anos": [int(a) for a in self.anos], "classes": list(self.classes),
+        }
+        with open(temporario_indices, "w", encoding="utf-8") as f:
+            json.dump(indices, f, ensure_ascii=False)
+        os.replace(temporario_indices, caminho_indices(caminho))
+        os.replace(temporario, caminho)
+
+    @classmethod
+    def abrir(cls, caminho, mmap=True):
+        # Com mmap, as páginas do arquivo são compartilhadas entre os processos que o abrem
+        with open(caminho_indices(caminho), encoding="utf-8") as f:
+            indices = json.load(f)
+        valores = np.load(caminho, mmap_mode="r" if mmap else None)
+        return cls(valores, indices["municipios"], indices["ufs"], indices["codigos_uf"], indices["anos"], indices["classes"])
+
+
+def caminho_indices(caminho):
+    return os.path.splitext(caminho)[0] + ".json"
+
+
+def caminho_denso(versao):
+    return os.path.join(denso_dir, f"areas-{versao}.npy")
+
+
+def remover_versoes_antigas(atual):
+    # Processos que ainda mapeiam uma versão antiga continuam lendo o arquivo removido
+    manter = {os.path.basename(atual), os.path.basename(caminho_indices(atual))}
+    for entrada in os.scandir(denso_dir):
+        if entrada.name.startswith("areas-") and entrada.name not in manter and not entrada.name.endswith(".tmp"):
+            os.remove(entrada.path)
+
+
+@st.cache_resource(show_spinner=False, max_entries=2)
+def _carregar_denso(caminho, versao):
+    arquivo = caminho_denso(versao)
+    try:
+        return ArmazenamentoDenso.abrir(arquivo)
+    except (OSError, ValueError, KeyError):
+        pass
+    denso = ArmazenamentoDenso.de_dataframe(_carregar_dados(caminho, versao))
+    try:
+        os.makedirs(denso_dir, exist_ok=True)
+        denso.salvar(arquivo)
+        remover_versoes_antigas(arquivo)
+        return ArmazenamentoDenso.abrir(arquivo)
+    except OSError:
+        # Sem permissão de escrita: segue com o array em memória
+        return denso
+
+
+def carregar_denso(caminho=None):
+    # Armazenamento denso opcional, persistido por versão dos dados em .cache/denso. É montado a partir da
+    # tabela já carregada pelo painel (o mesmo cache de dados.py) e não a substitui em memória
+    caminho = caminho or fonte_dados()
+    return _carregar_denso(caminho, versao_arquivo(caminho))
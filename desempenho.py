@@ -0,0 +1,92 @@
+import json
+import logging
+import os
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+import streamlit as st
+
+logger = logging.getLogger("desempenho")
+
+# DESEMPENHO_LOG=1 grava cada medição como uma linha JSON no log
+REGISTRAR_LOG = os.environ.get("DESEMPENHO_LOG") == "1"
+
+_local = threading.local()
+_ultima = {"medicoes": []}
+
+
+def medir_memoria(ativo=True):
+    # Pico de memória por seção via tracemalloc; deixa o código bem mais lento, por isso é opcional.
+    # O tracemalloc é global ao processo: com várias sessões simultâneas os picos se misturam.
+    if ativo and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    elif not ativo and tracemalloc.is_tracing():
+        tracemalloc.stop()
+
+
+def iniciar_execucao():
+    # Chamado no início de cada execução do script; as medições ficam por thread (uma por sessão)
+    _local.medicoes = []
+    _local.pilha = []
+    _local.inicio = time.perf_counter()
+
+
+def medicoes():
+    return getattr(_local, "medicoes", [])
+
+
+def ultima_execucao():
+    # Medições da última execução concluída em qualquer sessão (usado pelo benchmark)
+    return list(_ultima["medicoes"])
+
+
+@contextmanager
+def medir(nome):
+    if not hasattr(_local, "medicoes"):
+        iniciar_execucao()
+    # Registrada na entrada para manter a ordem de início (seções internas logo abaixo da externa)
+    medicao = {"secao": nome, "nivel": len(_local.pilha)}
+    _local.medicoes.append(medicao)
+    quadro = {"pico": 0}
+    memoria = tracemalloc.is_tracing()
+    if memoria:
+        atual, pico_anterior = tracemalloc.get_traced_memory()
+        if _local.pilha:
+            # Preserva o pico já visto pela seção externa antes de zerar o contador
+            _local.pilha[-1]["pico"] = max(_local.pilha[-1]["pico"], pico_anterior)
+        tracemalloc.reset_peak()
+        quadro["base"] = atual
+    _local.pilha.append(quadro)
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        medicao["ms"] = round((time.perf_counter() - inicio) * 1000, 2)
+        _local.pilha.pop()
+        if memoria:
+            pico = max(tracemalloc.get_traced_memory()[1], quadro["pico"])
+            medicao["pico_mb"] = round((pico - quadro["base"]) / 2 ** 20, 2)
+            if _local.pilha:
+                _local.pilha[-1]["pico"] = max(_local.pilha[-1]["pico"], pico)
+        if REGISTRAR_LOG:
+            logger.info(json.dumps(medicao, ensure_ascii=False))
+
+
+def finalizar_execucao():
+    total = {"secao": "total", "nivel": 0, "ms": round((time.perf_counter() - _local.inicio) * 1000, 2)}
+    _local.medicoes.append(total)
+    if REGISTRAR_LOG:
+        logger.info(json.dumps(total, ensure_ascii=False))
+    _ultima["medicoes"] = list(_local.medicoes)
+
+
+def painel_depuracao():
+    # Tabela de tempos da execução atual na barra lateral, ativada por ?depuracao=1 na URL
+    if st.query_params.get("depuracao") != "1":
+        return
+    with st.sidebar.expander("⏱️ Tempos desta execução", expanded=True):
+        linhas = [{"seção": "  " * m["nivel"] + m["secao"], "ms": m.get("ms"), **({"pico (MB)": m["pico_mb"]} if "pico_mb" in m else {})}
+                  for m in medicoes()]
+        st.dataframe(linhas, hide_index=True, use_container_width=True)
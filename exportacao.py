@@ -0,0 +1,85 @@
+import gzip
+import hashlib
+import os
+
+from dados import base_dir
+
+exportacoes_dir = os.path.join(base_dir, ".cache", "exportacoes")
+
+# Espaço máximo ocupado pelos arquivos exportados em disco
+LIMITE_CACHE_EXPORTACOES = 512 * 1024 * 1024
+# Linhas escritas por bloco
+LINHAS_POR_BLOCO = 50_000
+
+formatos = {
+    "CSV": {"extensao": ".csv", "mime": "text/csv"},
+    "CSV compactado (.csv.gz)": {"extensao": ".csv.gz", "mime": "application/gzip"},
+    "Parquet": {"extensao": ".parquet", "mime": "application/vnd.apache.parquet"},
+}
+
+
+def caminho_exportacao(versao, cidade, intervalo_anos, classes, formato):
+    chave = repr((versao, cidade, tuple(intervalo_anos), tuple(sorted(classes)), formato))
+    nome = hashlib.sha1(chave.encode("utf-8")).hexdigest()
+    return os.path.join(exportacoes_dir, nome + formatos[formato]["extensao"])
+
+
+def escrever_csv(blocos, arquivo):
+    for i, bloco in enumerate(blocos):
+        bloco.to_csv(arquivo, index=False, header=i == 0, sep=";", decimal=",")
+
+
+def escrever_parquet(blocos, caminho):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    escritor = None
+    try:
+        for bloco in blocos:
+            tabela = pa.Table.from_pandas(bloco, preserve_index=False)
+            if escritor is None:
+                escritor = pq.ParquetWriter(caminho, tabela.schema, compression="zstd")
+            escritor.write_table(tabela)
+    finally:
+        if escritor is not None:
+            escritor.close()
+
+
+def limitar_cache(limite_bytes=LIMITE_CACHE_EXPORTACOES):
+    # Remove os arquivos usados há mais tempo até caber no limite
+    arquivos = [e for e in os.scandir(exportacoes_dir) if e.is_file() and not e.name.endswith(".tmp")]
+    arquivos.sort(key=lambda e: e.stat().st_mtime)
+    total = sum(e.stat().st_size for e in arquivos)
+    for entrada in arquivos[:-1]:
+        if total <= limite_bytes:
+            break
+        total -= entrada.stat().st_size
+        os.remove(entrada.path)
+
+
+def gerar_exportacao(motor, versao, cidade, intervalo_anos, classes, formato):
+    # Gera o arquivo em blocos, sem montar a exportação inteira em memória
+    caminho = caminho_exportacao(versao, cidade, intervalo_anos, classes, formato)
+    if os.path.exists(caminho):
+        os.utime(caminho)
+        return caminho
+
+    os.makedirs(exportacoes_dir, exist_ok=True)
+    temporario = f"{caminho}.{os.getpid()}.tmp"
+    blocos = motor.blocos(cidade, intervalo_anos, classes, LINHAS_POR_BLOCO)
+    try:
+        if formato == "Parquet":
+            escrever_parquet(blocos, temporario)
+        elif formato == "CSV compactado (.csv.gz)":
+            with gzip.open(temporario, "wt", encoding="utf-8", newline="") as arquivo:
+                escrever_csv(blocos, arquivo)
+        else:
+            with open(temporario, "w", encoding="utf-8", newline="") as arquivo:
+                escrever_csv(blocos, arquivo)
+        os.replace(temporario, caminho)
+    finally:
+        if os.path.exists(temporario):
+            os.remove(temporario)
+
+    limitar_cache()
+    return caminho
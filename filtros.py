@@ -0,0 +1,155 @@
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from dados import _carregar_dados, fonte_dados, versao_arquivo
+
+ordem_canonica = ["NM_MUN", "ano", "nome_classe"]
+
+# Máximo de linhas enviadas ao navegador por página da tabela
+TAMANHO_MAXIMO_PAGINA = 500
+# Espaço máximo dos vetores de posição memorizados (as linhas filtradas não ficam em memória)
+LIMITE_MEMO_BYTES = 128 * 1024 * 1024
+
+
+class MotorFiltro:
+    # Resolve filtros por município, ano e classe com índices de posição
+    # pré-calculados, sem varrer a tabela inteira a cada seleção.
+
+    def __init__(self, df, limite_memo_bytes=LIMITE_MEMO_BYTES):
+        codigos_mun = df["NM_MUN"].cat.codes.to_numpy()
+        anos = df["ano"].to_numpy()
+        if not (np.all(np.diff(codigos_mun) >= 0) and np.all(np.diff(anos)[np.diff(codigos_mun) == 0] >= 0)):
+            df = df.sort_values(ordem_canonica, kind="stable").reset_index(drop=True)
+            codigos_mun = df["NM_MUN"].cat.codes.to_numpy()
+            anos = df["ano"].to_numpy()
+
+        self.df = df
+        self._anos = anos
+        self._codigos_classe = df["nome_classe"].cat.codes.to_numpy()
+        self._categorias_classe = df["nome_classe"].cat.categories
+
+        # Faixa contígua [início, fim) de cada município
+        municipios = df["NM_MUN"].cat.categories
+        limites = np.searchsorted(codigos_mun, np.arange(len(municipios) + 1))
+        self._faixa_municipio = {m: (limites[i], limites[i + 1]) for i, m in enumerate(municipios)}
+
+        # Posições das linhas de cada ano, para o filtro sem município
+        ordem = np.argsort(anos, kind="stable")
+        anos_ordenados = anos[ordem]
+        self._lista_anos = np.unique(anos_ordenados)
+        limites_ano = np.searchsorted(anos_ordenados, self._lista_anos)
+        limites_ano = np.append(limites_ano, len(anos_ordenados))
+        self._posicoes_ano = ordem
+        self._faixa_ano = {int(a): (limites_ano[i], limites_ano[i + 1]) for i, a in enumerate(self._lista_anos)}
+
+        self._memo = OrderedDict()
+        self._memo_bytes = 0
+        self._limite_memo_bytes = limite_memo_bytes
+        self._trava = threading.Lock()
+
+    def _mascara_classes(self, classes):
+        permitidas = np.zeros(len(self._categorias_classe), dtype=bool)
+        indices = self._categorias_classe.get_indexer(list(classes))
+        permitidas[indices[indices >= 0]] = True
+        return permitidas
+
+    def posicoes(self, cidade, intervalo_anos, classes):
+        inicio_ano, fim_ano = intervalo_anos
+        if cidade != "Todos":
+            inicio, fim = self._faixa_municipio.get(cidade, (0, 0))
+            anos = self._anos[inicio:fim]
+            inicio, fim = inicio + np.searchsorted(anos, inicio_ano, "left"), inicio + np.searchsorted(anos, fim_ano, "right")
+            posicoes = np.arange(inicio, fim)
+        else:
+            faixas = [self._faixa_ano[a] for a in range(inicio_ano, fim_ano + 1) if a in self._faixa_ano]
+            if faixas:
+                posicoes = np.sort(self._posicoes_ano[faixas[0][0]:faixas[-1][1]])
+            else:
+                posicoes = np.arange(0)
+
+        if len(classes) < len(self._categorias_classe):
+            permitidas = self._mascara_classes(classes)
+            posicoes = posicoes[permitidas[self._codigos_classe[posicoes]]]
+        return posicoes
+
+    def _memorizado(self, chave, calcular):
+        with self._trava:
+            if chave in self._memo:
+                self._memo.move_to_end(chave)
+                return self._memo[chave]
+
+        valor = calcular()
+        with self._trava:
+            if chave in self._memo:
+                self._memo_bytes -= self._memo.pop(chave).nbytes
+            self._memo[chave] = valor
+            self._memo_bytes += valor.nbytes
+            # LRU limitada pelo tamanho dos vetores; o mais recente sempre fica
+            while self._memo_bytes > self._limite_memo_bytes and len(self._memo) > 1:
+                _, removido = self._memo.popitem(last=False)
+                self._memo_bytes -= removido.nbytes
+        return valor
+
+    def _posicoes_ordenadas(self, cidade, intervalo_anos, classes, ordenar_por, ascendente):
+        chave = ("ordem", cidade, tuple(intervalo_anos), tuple(sorted(classes)), ordenar_por, ascendente)
+
+        def calcular():
+            posicoes = self.posicoes(cidade, intervalo_anos, classes)
+            if ordenar_por is None:
+                return posicoes
+            coluna = self.df[ordenar_por]
+            valores = coluna.cat.codes.to_numpy() if coluna.dtype == "category" else coluna.to_numpy()
+            ordem = np.argsort(valores[posicoes], kind="stable")
+            return posicoes[ordem if ascendente else ordem[::-1]]
+
+        return self._memorizado(chave, calcular)
+
+    def contar(self, cidade, intervalo_anos, classes):
+        return len(self._posicoes_ordenadas(cidade, intervalo_anos, classes, None, True))
+
+    def contagens(self, cidade, intervalo_anos, classes, coluna):
+        # Linhas do filtro por categoria de uma coluna categórica, contando só os códigos (sem materializar linhas)
+        posicoes = self._posicoes_ordenadas(cidade, intervalo_anos, classes, None, True)
+        codigos = self.df[coluna].cat.codes.to_numpy()[posicoes]
+        categorias = self.df[coluna].cat.categories
+        return pd.Series(np.bincount(codigos, minlength=len(categorias)), index=categorias)
+
+    def pagina(self, cidade, intervalo_anos, classes, colunas, ordenar_por=None, ascendente=True,
+               numero=1, tamanho=100):
+        # Ordena apenas as posições e materializa somente as linhas e colunas da página
+        tamanho = min(tamanho, TAMANHO_MAXIMO_PAGINA)
+        posicoes = self._posicoes_ordenadas(cidade, intervalo_anos, classes, ordenar_por, ascendente)
+        inicio = (numero - 1) * tamanho
+        linhas = posicoes[inicio:inicio + tamanho]
+        df_pagina = self.df.iloc[linhas, self.df.columns.get_indexer(list(colunas))]
+        df_pagina.index = np.arange(inicio, inicio + len(linhas))
+        return df_pagina
+
+    def blocos(self, cidade, intervalo_anos, classes, linhas_por_bloco):
+        # Percorre o resultado do filtro em blocos; sempre produz ao menos um (possivelmente vazio)
+        posicoes = self.posicoes(cidade, intervalo_anos, classes)
+        yield self.df.iloc[posicoes[:linhas_por_bloco]]
+        for inicio in range(linhas_por_bloco, len(posicoes), linhas_por_bloco):
+            yield self.df.iloc[posicoes[inicio:inicio + linhas_por_bloco]]
+
+    def filtrar(self, cidade, intervalo_anos, classes, colunas=None):
+        # Materializa as linhas (e só as colunas pedidas) a cada chamada; apenas as posições ficam memorizadas
+        posicoes = self._posicoes_ordenadas(cidade, intervalo_anos, classes, None, True)
+        indices_colunas = slice(None) if colunas is None else self.df.columns.get_indexer(list(colunas))
+        if len(posicoes) and posicoes[-1] - posicoes[0] + 1 == len(posicoes):
+            return self.df.iloc[posicoes[0]:posicoes[-1] + 1, indices_colunas]
+        return self.df.iloc[posicoes, indices_colunas]
+
+
+@st.cache_resource(max_entries=2)
+def _carregar_motor(caminho, versao):
+    return MotorFiltro(_carregar_dados(caminho, versao))
+
+
+def carregar_motor(caminho=None):
+    caminho = caminho or fonte_dados()
+    return _carregar_motor(caminho, versao_arquivo(caminho))
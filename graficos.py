@@ -0,0 +1,205 @@
+import pandas as pd
+import plotly.express as px
+import plotly.io as pio
+import streamlit as st
+
+from cache import CacheLRU
+from dados import mapa_cores
+from desempenho import medir
+
+# Acima deste número de pontos as séries usam WebGL (scattergl)
+LIMITE_PONTOS_WEBGL = 2000
+# Pontos desenhados no máximo no gráfico de dispersão (o restante é amostrado)
+MAXIMO_PONTOS_DISPERSAO = 5000
+# Limite de memória das figuras serializadas em cache
+LIMITE_CACHE_FIGURAS = 64 * 1024 * 1024
+
+rotulos_classe = {"ano": "Ano", "area_ha": "Área (ha)", "nome_classe": "Classe de Cobertura"}
+
+
+@st.cache_resource
+def cache_figuras():
+    return CacheLRU(LIMITE_CACHE_FIGURAS)
+
+
+def figura(id_grafico, chave, construir):
+    # Figura serializada por (gráfico, estado dos filtros); construída só na primeira vez
+    cache = cache_figuras()
+    with medir(f"figura: {id_grafico}"):
+        texto = cache.obter((id_grafico, chave))
+        if texto is None:
+            texto = construir().to_json()
+            cache.guardar((id_grafico, chave), texto)
+        return pio.from_json(texto)
+
+
+def modo_render(df):
+    return "webgl" if len(df) > LIMITE_PONTOS_WEBGL else "auto"
+
+
+def linha_classes(df):
+    fig1 = px.line(
+        df,
+        x="ano",
+        y="area_ha",
+        color="nome_classe",
+        color_discrete_map=mapa_cores,
+        labels=rotulos_classe,
+        title="Evolução da Cobertura do Solo",
+        render_mode=modo_render(df)
+    )
+    fig1.update_layout(legend_title="Classe de Cobertura", hovermode="x unified")
+    return fig1
+
+
+def area_classes(df):
+    fig_area = px.area(
+        df,
+        x="ano",
+        y="area_ha",
+        color="nome_classe",
+        color_discrete_map=mapa_cores,
+        labels=rotulos_classe,
+        title="Área Acumulada por Classe ao Longo do Tempo"
+    )
+    fig_area.update_layout(legend_title="Classe de Cobertura")
+    return fig_area
+
+
+def amostrar_pontos(df, limite=MAXIMO_PONTOS_DISPERSAO):
+    # Mantém o mínimo e o máximo de cada (ano, classe) e completa o limite com uma amostra fixa das demais linhas
+    if len(df) <= limite:
+        return df
+    df = df.reset_index(drop=True)
+    grupos = df.groupby(["ano", "nome_classe"], observed=True)["area_ha"]
+    extremos = pd.Index(grupos.idxmin()).union(pd.Index(grupos.idxmax()))
+    resto = df.drop(extremos)
+    amostra = resto.sample(n=min(len(resto), max(0, limite - len(extremos))), random_state=0)
+    return pd.concat([df.loc[extremos], amostra]).sort_index()
+
+
+def dispersao_classes(df):
+    total = len(df)
+    df = amostrar_pontos(df)
+    titulo = "Dispersão das Áreas por Classe e Ano"
+    if len(df) < total:
+        titulo += f" (amostra de {len(df)} de {total} registros)"
+    fig_scatter = px.scatter(
+        df,
+        x="ano",
+        y="area_ha",
+        color="nome_classe",
+        size="area_ha",
+        color_discrete_map=mapa_cores,
+        labels={"ano": "Ano", "area_ha": "Área (ha)"},
+        title=titulo,
+        render_mode=modo_render(df)
+    )
+    fig_scatter.update_layout(legend_title="Classe de Cobertura")
+    return fig_scatter
+
+
+def barras_distribuicao(df_ano, ano_analise):
+    fig2 = px.bar(
+        df_ano.sort_values("area_ha", ascending=False),
+        x="nome_classe",
+        y="area_ha",
+        color="nome_classe",
+        color_discrete_map=mapa_cores,
+        title=f"Distribuição da Cobertura em {ano_analise}"
+    )
+    fig2.update_layout(xaxis_title="Classe", yaxis_title="Área (ha)", showlegend=False)
+    return fig2
+
+
+def pizza_participacao(df_pizza, ano_percentual):
+    return px.pie(
+        df_pizza,
+        names="nome_classe",
+        values="area_ha",
+        color="nome_classe",
+        color_discrete_map=mapa_cores,
+        title=f"Participação Percentual das Classes em {ano_percentual}"
+    )
+
+
+def barras_decada(df_decada):
+    fig_dec = px.bar(
+        df_decada,
+        x="decada",
+        y="area_ha",
+        color="nome_classe",
+        barmode="stack",
+        color_discrete_map=mapa_cores,
+        title="Distribuição da Cobertura por Década"
+    )
+    fig_dec.update_layout(xaxis_title="Década", yaxis_title="Área (ha)", legend_title="Classe de Cobertura")
+    return fig_dec
+
+
+def barras_comparacao(df_diff, ano_comp1, ano_comp2):
+    df_melt = df_diff.reset_index().melt(id_vars="nome_classe", value_vars=["Ano 1", "Ano 2"], var_name="Ano", value_name="Área (ha)")
+    fig_comp = px.bar(
+        df_melt,
+        x="nome_classe",
+        y="Área (ha)",
+        color="Ano",
+        barmode="group",
+        title=f"Comparação da Cobertura do Solo entre {ano_comp1} e {ano_comp2}"
+    )
+    fig_comp.update_layout(xaxis_title="Classe de Cobertura", yaxis_title="Área (ha)")
+    return fig_comp
+
+
+def barras_variacao(df_pivot):
+    fig_dif = px.bar(df_pivot.reset_index(), x="nome_classe", y="variação",
+                     title="Mudança Líquida de Área (ha) por Classe",
+                     color="variação",
+                     color_continuous_scale="RdYlGn")
+    fig_dif.update_layout(xaxis_title="Classe", yaxis_title="Área (ha)", showlegend=False)
+    return fig_dif
+
+
+def linha_antropizacao(df_idx):
+    return px.line(df_idx.reset_index(), x="ano", y="índice", title="Índice de Antropização ao Longo do Tempo",
+                   labels={"índice": "% Área Antropizada"})
+
+
+def linhas_municipios(df, colunas=3):
+    # Pequenos múltiplos: um painel por município, com eixos compartilhados
+    fig = px.line(
+        df,
+        x="ano",
+        y="area_ha",
+        color="nome_classe",
+        facet_col="NM_MUN",
+        facet_col_wrap=colunas,
+        color_discrete_map=mapa_cores,
+        labels=rotulos_classe,
+        title="Evolução da Cobertura do Solo por Município",
+        render_mode=modo_render(df)
+    )
+    fig.for_each_annotation(lambda a: a.update(text=a.text.split("=")[-1]))
+    fig.update_layout(legend_title="Classe de Cobertura", height=300 * -(-df["NM_MUN"].nunique() // colunas))
+    return fig
+
+
+def linha_antropizacao_municipios(df_idx):
+    return px.line(df_idx.reset_index(), x="ano", y="índice", color="NM_MUN", title="Índice de Antropização por Município",
+                   labels={"índice": "% Área Antropizada", "NM_MUN": "Município"})
+
+
+def barras_perda_municipios(df_perda, limite):
+    fig = px.bar(df_perda.reset_index(), x="NM_MUN", y="perda_percentual", title="Perda de Vegetação Nativa por Município",
+                 labels={"NM_MUN": "Município", "perda_percentual": "Perda (%)"})
+    fig.add_hline(y=limite, line_dash="dash", line_color="red")
+    return fig
+
+
+def linha_taxa_mudanca(df_taxa, janela):
+    df = df_taxa.reset_index().melt(id_vars="ano", var_name="série", value_name="ha/ano")
+    fig = px.line(df, x="ano", y="ha/ano", color="série",
+                  title=f"Taxa de Mudança da Cobertura (média móvel de {janela} anos) e Aceleração",
+                  labels={"ano": "Ano", "série": ""})
+    fig.update_layout(hovermode="x unified")
+    return fig
@@ -0,0 +1,88 @@
+# Inclusão de novos anos da coleção MapBiomas no armazenamento particionado:
+#   python ingestao.py novo_ano.csv [--png municipios_2024.png --pgw municipios_2024.pgw]
+# O CSV segue o formato do histórico e pode ter um ou mais anos; cada ano substitui a
+# sua partição e os demais não são relidos. Um painel em execução passa a usar a nova
+# partição na próxima interação, sem reiniciar.
+import argparse
+import os
+import shutil
+
+from dados import caminho_particao, csv_path, ler_csv, listar_particoes, particoes_dir
+from mapas import caminhos_mapa, ler_pgw, mapas_dir
+
+
+def gravar_particao(df_ano, ano, diretorio=particoes_dir):
+    os.makedirs(diretorio, exist_ok=True)
+    caminho = caminho_particao(ano, diretorio)
+    temporario = caminho + ".tmp"
+    df_ano = df_ano.reset_index(drop=True)
+    for coluna in df_ano.select_dtypes(include="category").columns:
+        df_ano[coluna] = df_ano[coluna].cat.remove_unused_categories()
+    try:
+        df_ano.to_parquet(temporario, index=False)
+        # Troca atômica: quem estiver lendo vê a partição antiga ou a nova, nunca pela metade
+        os.replace(temporario, caminho)
+    finally:
+        if os.path.exists(temporario):
+            os.remove(temporario)
+    return caminho
+
+
+def gravar_particoes(df, diretorio=particoes_dir):
+    # {ano: caminho} das partições gravadas
+    return {int(ano): gravar_particao(df_ano, int(ano), diretorio) for ano, df_ano in df.groupby("ano", sort=True)}
+
+
+def particionar(caminho=csv_path, diretorio=particoes_dir):
+    # Migração inicial: divide o CSV único em uma partição por ano
+    return gravar_particoes(ler_csv(caminho), diretorio)
+
+
+def ingerir(caminho, diretorio=particoes_dir):
+    if not listar_particoes(diretorio) and os.path.exists(csv_path):
+        # Sem partições ainda: o histórico existente entra antes do ano novo
+        particionar(csv_path, diretorio)
+    df = ler_csv(caminho)
+    if df.empty:
+        raise ValueError(f"Nenhuma linha com classe conhecida em {caminho}")
+    return gravar_particoes(df, diretorio)
+
+
+def ingerir_raster(ano, png_path, pgw_path):
+    if len(ler_pgw(pgw_path)) != 6:
+        raise ValueError(f"World file inválido: {pgw_path}")
+    os.makedirs(mapas_dir, exist_ok=True)
+    # O world file vai primeiro: o raster só aparece para o painel quando o par está completo
+    for origem, destino in zip((pgw_path, png_path), reversed(caminhos_mapa(ano))):
+        temporario = destino + ".tmp"
+        shutil.copyfile(origem, temporario)
+        os.replace(temporario, destino)
+    return caminhos_mapa(ano)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inclui novos anos de estatísticas MapBiomas no armazenamento particionado.")
+    parser.add_argument("csv", nargs="?", help="CSV com as estatísticas do(s) ano(s) novo(s)")
+    parser.add_argument("--png", help="Raster dos municípios do ano novo")
+    parser.add_argument("--pgw", help="World file do raster")
+    parser.add_argument("--particionar", action="store_true", help="Apenas divide o CSV histórico em partições anuais")
+    args = parser.parse_args()
+
+    if args.particionar:
+        gravadas = particionar()
+    elif args.csv:
+        gravadas = ingerir(args.csv)
+    else:
+        parser.error("informe o CSV ou --particionar")
+    print(f"Anos gravados em {particoes_dir}: {', '.join(map(str, gravadas))}")
+
+    if args.png or args.pgw:
+        if not (args.png and args.pgw):
+            parser.error("--png e --pgw devem ser informados juntos")
+        # O raster é associado ao ano mais recente do CSV
+        for caminho in ingerir_raster(max(gravadas), args.png, args.pgw):
+            print(f"Mapa gravado em {caminho}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+# Inicia o painel com os caches compartilhados já preenchidos:
+#   python iniciar.py [opções do streamlit run, ex.: --server.port=8501 --server.headless=true]
+# Carrega dados, motor de filtro, cubo de agregados, coordenadas e rasters dos mapas no mesmo processo
+# do servidor, antes de aceitar conexões; a primeira sessão já encontra tudo em st.cache_resource.
+import os
+import sys
+
+from dados import base_dir, carregar_dados, versao_arquivo, versao_dados
+from desempenho import finalizar_execucao, iniciar_execucao, medicoes, medir
+
+app_path = os.path.join(base_dir, "app.py")
+
+
+def preaquecer():
+    # Mesmas chamadas (e argumentos) da primeira execução do app.py, para acertar as mesmas chaves de cache
+    from agregados import LIMITE_PERDA_NATIVA, carregar_cubo
+    from denso import USAR_DENSO, carregar_denso
+    from filtros import carregar_motor
+    from mapas import anos_comparativo, carregar_base, carregar_gazetteer, coord_path, municipios_sem_coordenadas, pre_renderizar
+    from secoes import Contexto, analises_estados, ranking_alertas, renderizar, secoes
+
+    iniciar_execucao()
+    with medir("pré-aquecimento"):
+        with medir("dados"):
+            df = carregar_dados()
+            municipios = tuple(df["NM_MUN"].cat.categories)
+        with medir("motor de filtro"):
+            carregar_motor()
+        with medir("coordenadas"):
+            carregar_gazetteer()
+            municipios_sem_coordenadas(municipios, versao_arquivo(coord_path))
+        with medir("agregados"):
+            cubo = carregar_cubo()
+            versao = versao_dados()
+            ranking_alertas(versao, float(LIMITE_PERDA_NATIVA))
+            analises_estados(versao, tuple(sorted(cubo["municipios_estado"].index)))
+            if USAR_DENSO:
+                carregar_denso()
+        with medir("mapas"):
+            for ano in anos_comparativo():
+                carregar_base(ano)
+            if os.environ.get("PRE_RENDERIZAR_MAPAS") == "1":
+                pre_renderizar(municipios, tuple(anos_comparativo()))
+        # Aba inicial com os filtros padrão do painel ("Todos", todas as classes, todos os anos):
+        # as figuras ficam no cache compartilhado de graficos.figura
+        anos = sorted(int(ano) for ano in df["ano"].unique())
+        classes = sorted(df["nome_classe"].unique())
+        intervalo = (min(anos), max(anos))
+        ctx = Contexto(versao, "Todos", intervalo, tuple(classes), anos, float(LIMITE_PERDA_NATIVA))
+        renderizar(next(iter(secoes)), ctx)
+    finalizar_execucao()
+    return medicoes()
+
+
+def main():
+    # O pré-aquecimento chama funções de seção fora de uma sessão; sem o aviso de "streamlit run" no log
+    from streamlit import config
+
+    config.set_option("global.showWarningOnDirectExecution", False)
+    for medicao in preaquecer():
+        if medicao["secao"] != "total":
+            print(f"{'  ' * medicao['nivel']}{medicao['secao']}: {medicao['ms']} ms", flush=True)
+
+    # O servidor roda neste mesmo processo, reaproveitando os caches preenchidos acima
+    from streamlit.web import cli
+
+    sys.argv = ["streamlit", "run", app_path, *sys.argv[1:]]
+    sys.exit(cli.main())
+
+
+if __name__ == "__main__":
+    main()
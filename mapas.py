@@ -0,0 +1,233 @@
+import logging
+import os
+import re
+import threading
+import unicodedata
+from io import BytesIO
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+from PIL import Image
+
+from cache import CacheLRU
+from dados import base_dir, versao_arquivo
+
+logger = logging.getLogger(__name__)
+
+mapas_dir = os.path.join(base_dir, "municipios_shapefile")
+coord_path = os.path.join(base_dir, "coordenadas", "municipios_coord.csv")
+
+# Largura final dos mapas exibidos no painel
+LARGURA_MAPA = 800
+# Limite de memória das imagens com pin já codificadas
+LIMITE_CACHE_MAPAS = 128 * 1024 * 1024
+
+
+def caminhos_mapa(ano):
+    return (os.path.join(mapas_dir, f"municipios_{ano}.png"),
+            os.path.join(mapas_dir, f"municipios_{ano}.pgw"))
+
+
+def anos_com_mapa():
+    # Anos com raster e world file disponíveis, em ordem
+    try:
+        nomes = os.listdir(mapas_dir)
+    except OSError:
+        return []
+    anos = [int(achado.group(1)) for achado in map(lambda nome: re.fullmatch(r"municipios_(\d{4})\.png", nome), nomes) if achado]
+    return sorted(ano for ano in anos if os.path.exists(caminhos_mapa(ano)[1]))
+
+
+def anos_comparativo():
+    # Primeiro e último ano com mapa: um raster novo ingerido passa a ser o mais recente
+    anos = [str(ano) for ano in anos_com_mapa()]
+    return anos[:1] + anos[1:][-1:]
+
+
+def ler_pgw(caminho):
+    with open(caminho) as f:
+        return [float(linha) for linha in f if linha.strip()]
+
+
+def geo_to_pixel(lon, lat, pgw):
+    A, D, B, E, C, F = pgw
+    x = int((lon - C) / A)
+    y = int((lat - F) / E)
+    return x, y
+
+
+def reescalar_pgw(pgw, escala):
+    # O world file referencia o centro do pixel superior esquerdo
+    A, D, B, E, C, F = pgw
+    return [A / escala, D / escala, B / escala, E / escala,
+            C - A / 2 + A / escala / 2, F - E / 2 + E / escala / 2]
+
+
+@st.cache_resource(show_spinner=False, max_entries=8)
+def _carregar_base(ano, versao, largura):
+    png_path, pgw_path = caminhos_mapa(ano)
+    with Image.open(png_path) as image:
+        escala = largura / image.width
+        reduzida = image.resize((largura, int(image.height * escala)))
+    return reduzida, reescalar_pgw(ler_pgw(pgw_path), escala), escala
+
+
+def carregar_base(ano, largura=LARGURA_MAPA):
+    # Imagem base já reduzida, world file correspondente e fator de escala
+    return _carregar_base(ano, versao_arquivo(caminhos_mapa(ano)[0]), largura)
+
+
+def geo_to_pixel_vetorizado(lons, lats, pgw):
+    A, D, B, E, C, F = pgw
+    x = ((np.asarray(lons) - C) / A).astype(int)
+    y = ((np.asarray(lats) - F) / E).astype(int)
+    return x, y
+
+
+def normalizar_nome(nome):
+    # Ignora acentos, caixa e espaços extras
+    sem_acento = unicodedata.normalize("NFKD", str(nome)).encode("ascii", "ignore").decode()
+    return " ".join(sem_acento.lower().split())
+
+
+class Gazetteer:
+    # Índice nome normalizado -> (lon, lat), com projeção em pixels por world file
+
+    def __init__(self, df_coord):
+        nomes = df_coord["nome_municipio"].map(normalizar_nome)
+        # Nomes repetidos (homônimos em UFs diferentes, ex.: Pau D'Arco) usam a primeira linha, como a busca original
+        self.indice = {}
+        for i, nome in enumerate(nomes):
+            self.indice.setdefault(nome, i)
+        repetidos = sorted(set(df_coord["nome_municipio"][nomes.duplicated().to_numpy()]))
+        if repetidos:
+            logger.warning("Municípios com mais de uma coordenada; usando a primeira: %s", ", ".join(repetidos))
+        self.lons = df_coord["longitude"].to_numpy(dtype=float)
+        self.lats = df_coord["latitude"].to_numpy(dtype=float)
+        self._pixels = {}
+        self._trava = threading.Lock()
+
+    def __contains__(self, nome_municipio):
+        return normalizar_nome(nome_municipio) in self.indice
+
+    def coordenadas(self, nome_municipio):
+        i = self.indice.get(normalizar_nome(nome_municipio))
+        if i is None:
+            return None
+        return self.lons[i], self.lats[i]
+
+    def projetar(self, nomes, pgw):
+        # Projeção em lote: (x, y, encontrados). Um pixel válido pode ser negativo (fora da imagem),
+        # então os nomes sem coordenadas são indicados pela máscara, não por um valor sentinela
+        posicoes = np.array([self.indice.get(normalizar_nome(n), -1) for n in nomes], dtype=int)
+        encontrados = posicoes >= 0
+        x, y = self.pixels(pgw)
+        return x[posicoes], y[posicoes], encontrados
+
+    def pixels(self, pgw):
+        # Posições em pixel de todos os municípios, calculadas uma vez por world file
+        chave = tuple(pgw)
+        with self._trava:
+            if chave not in self._pixels:
+                self._pixels[chave] = geo_to_pixel_vetorizado(self.lons, self.lats, pgw)
+            return self._pixels[chave]
+
+    def pixel(self, nome_municipio, pgw):
+        i = self.indice.get(normalizar_nome(nome_municipio))
+        if i is None:
+            return None
+        x, y = self.pixels(pgw)
+        return int(x[i]), int(y[i])
+
+    def ausentes(self, nomes):
+        return sorted(n for n in set(nomes) if normalizar_nome(n) not in self.indice)
+
+
+@st.cache_resource(show_spinner=False, max_entries=2)
+def _carregar_gazetteer(caminho, versao):
+    return Gazetteer(pd.read_csv(caminho))
+
+
+def carregar_gazetteer(caminho=coord_path):
+    return _carregar_gazetteer(caminho, versao_arquivo(caminho))
+
+
+@st.cache_resource(show_spinner=False, max_entries=2)
+def municipios_sem_coordenadas(municipios, versao_coord):
+    # Validação feita uma vez por versão dos dados e das coordenadas
+    ausentes = carregar_gazetteer().ausentes(municipios)
+    if ausentes:
+        logger.warning("Municípios sem coordenadas em %s: %s", coord_path, ", ".join(ausentes))
+    return ausentes
+
+
+def marcar_com_pin(nome_municipio, base_image, pixel, escala=1.0):
+    return marcar_com_pins([nome_municipio], base_image, [pixel], escala)
+
+
+def marcar_com_pins(nomes, base_image, pixels, escala=1.0):
+    # Todos os pins desenhados sobre uma única cópia da imagem base
+    from PIL import ImageDraw, ImageFont
+
+    imagem_marcada = base_image.copy()
+    draw = ImageDraw.Draw(imagem_marcada)
+    raio = max(2, round(10 * escala))
+    haste = max(3, round(15 * escala))
+    fonte = ImageFont.load_default()
+
+    for nome_municipio, pixel in zip(nomes, pixels):
+        if pixel is None:
+            continue
+        x, y = pixel
+        draw.line((x, y, x, y + haste), fill="red", width=max(1, round(3 * escala)))
+        draw.ellipse((x - raio, y - raio, x + raio, y + raio), fill="red", outline="black", width=1)
+        draw.text((x + raio, y - 5), nome_municipio.strip().title(), fill="black", font=fonte)
+
+    return imagem_marcada
+
+
+@st.cache_resource
+def cache_imagens():
+    return CacheLRU(LIMITE_CACHE_MAPAS)
+
+
+def imagem_com_pin(nome_municipio, ano):
+    base_image, pgw, escala = carregar_base(ano)
+    chave = (nome_municipio, str(ano), versao_arquivo(caminhos_mapa(ano)[0]))
+    cache = cache_imagens()
+    conteudo = cache.obter(chave)
+    if conteudo is None:
+        pixel = carregar_gazetteer().pixel(nome_municipio, pgw)
+        imagem_marcada = marcar_com_pin(nome_municipio, base_image, pixel, escala)
+        buffer = BytesIO()
+        imagem_marcada.save(buffer, format="PNG")
+        conteudo = buffer.getvalue()
+        cache.guardar(chave, conteudo)
+    return conteudo
+
+
+def imagem_com_pins(nomes, ano):
+    # Mapa com um pin por município, em cache pelo conjunto de municípios
+    nomes = tuple(sorted(nomes))
+    base_image, pgw, escala = carregar_base(ano)
+    chave = (nomes, str(ano), versao_arquivo(caminhos_mapa(ano)[0]))
+    cache = cache_imagens()
+    conteudo = cache.obter(chave)
+    if conteudo is None:
+        x, y, encontrados = carregar_gazetteer().projetar(nomes, pgw)
+        pixels = [(int(px), int(py)) if achado else None for px, py, achado in zip(x, y, encontrados)]
+        imagem_marcada = marcar_com_pins(nomes, base_image, pixels, escala)
+        buffer = BytesIO()
+        imagem_marcada.save(buffer, format="PNG")
+        conteudo = buffer.getvalue()
+        cache.guardar(chave, conteudo)
+    return conteudo
+
+
+@st.cache_resource(show_spinner="Gerando mapas...")
+def pre_renderizar(municipios, anos):
+    # Gera antecipadamente os mapas de todos os municípios, uma vez por processo
+    for ano in anos:
+        for nome_municipio in municipios:
+            imagem_com_pin(nome_municipio, ano)
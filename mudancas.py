@@ -0,0 +1,62 @@
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+# Áreas em um array denso entidade × período × classe, com os rótulos de cada eixo
+Tensor = namedtuple("Tensor", ["valores", "entidades", "periodos", "classes"])
+
+
+def densificar(serie, nivel="NM_MUN", periodo="ano"):
+    # Série (entidade, período, nome_classe) -> Tensor, com zero onde não há área.
+    # Sem nível de entidade (nivel=None) a série inteira vira uma única entidade.
+    indice = serie.index
+    eixos = [(periodo, indice.get_level_values(periodo)), ("nome_classe", indice.get_level_values("nome_classe"))]
+    if nivel is not None:
+        eixos.insert(0, (nivel, indice.get_level_values(nivel)))
+
+    codigos, rotulos = [], []
+    for nome, valores in eixos:
+        cod, uniq = pd.factorize(valores, sort=True)
+        codigos.append(cod)
+        rotulos.append(pd.Index(uniq, name=nome))
+    if nivel is None:
+        codigos.insert(0, np.zeros(len(serie), dtype=int))
+        rotulos.insert(0, pd.Index(["Todos"], name="entidade"))
+
+    # Chaves repetidas (ex.: municípios homônimos em UFs diferentes) são somadas
+    forma = tuple(len(r) for r in rotulos)
+    posicoes = np.ravel_multi_index(tuple(codigos), forma)
+    valores = np.bincount(posicoes, weights=serie.to_numpy(dtype="float64"), minlength=int(np.prod(forma))).reshape(forma)
+    return Tensor(valores, *rotulos)
+
+
+def mudanca_absoluta(tensor):
+    # Soma das |diferenças| entre períodos consecutivos, por entidade; rotulada pelo período final
+    mudanca = np.abs(np.diff(tensor.valores, axis=1)).sum(axis=2)
+    return pd.DataFrame(mudanca, index=tensor.entidades, columns=tensor.periodos[1:])
+
+
+def maior_mudanca(tensor):
+    # Período de maior mudança absoluta de cada entidade e o valor dessa mudança
+    mudanca = mudanca_absoluta(tensor)
+    if mudanca.shape[1] == 0:
+        return pd.DataFrame({tensor.periodos.name: [], "alteracao": []}, index=tensor.entidades[:0])
+    posicao = mudanca.to_numpy().argmax(axis=1)
+    return pd.DataFrame({
+        tensor.periodos.name: mudanca.columns[posicao],
+        "alteracao": mudanca.to_numpy()[np.arange(len(mudanca)), posicao],
+    }, index=mudanca.index)
+
+
+def taxa_movel(tensor, janela=5):
+    # Mudança absoluta média por período nas últimas `janela` transições; rotulada pelo fim da janela
+    mudanca = mudanca_absoluta(tensor)
+    acumulada = np.cumsum(np.pad(mudanca.to_numpy(), ((0, 0), (1, 0))), axis=1)
+    taxa = (acumulada[:, janela:] - acumulada[:, :-janela]) / janela
+    return pd.DataFrame(taxa, index=mudanca.index, columns=mudanca.columns[janela - 1:])
+
+
+def aceleracao(taxa):
+    # Variação da taxa móvel entre períodos consecutivos
+    return taxa.diff(axis=1).iloc[:, 1:]
@@ -0,0 +1,259 @@
+# Publicação das análises por estado para leitura programática, sem passar pelo painel:
+#   python publicacao.py construir            # grava publicacao/<versão dos dados>/ e aponta "atual" para ela
+#   python publicacao.py servir --porta 8502  # serve os arquivos com ETag e GET condicional
+# Cada análise vira um Parquet (zstd) e um JSON compactado (gzip). Os endereços sem versão
+# (/perda_nativa.json) seguem a versão atual e devem ser revalidados; os com versão
+# (/<versão>/perda_nativa.json) nunca mudam.
+import argparse
+import functools
+import gzip
+import hashlib
+import io
+import json
+import os
+import re
+import shutil
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+from agregados import carregar_cubo, indicadores_estados
+from dados import base_dir, fonte_dados, versao_arquivo
+
+publicacao_dir = os.environ.get("PUBLICACAO_DIR") or os.path.join(base_dir, "publicacao")
+
+# Versões mantidas em disco além da atual (leitores podem estar presos a uma versão anterior)
+VERSOES_ANTERIORES = 2
+
+# Nome público de cada resultado de indicadores_estados
+analises = {
+    "municipios": ("df_mun", "Quantidade de municípios por estado"),
+    "perda_nativa": ("df_nat_agg", "Variação da vegetação nativa por estado entre os anos de referência (ha)"),
+    "crescimento_agricola": ("df_agro", "Variação das classes agrícolas por estado entre os anos de referência (ha)"),
+    "urbanizacao": ("df_urb_agg", "Área urbana por estado e ano (ha)"),
+    "antropizacao": ("df_idx", "Índice de antropização por estado e ano (%)"),
+    "diversidade": ("df_div", "Número de classes presentes por estado e ano"),
+    "decada_maior_alteracao": ("df_alt_max", "Década de maior alteração de uso e cobertura por estado (variação da área média anual entre décadas, ha)"),
+}
+
+tipos_conteudo = {
+    ".parquet": "application/vnd.apache.parquet",
+    ".json": "application/json; charset=utf-8",
+}
+
+
+def calcular_etag(conteudo):
+    return '"' + hashlib.sha256(conteudo).hexdigest()[:32] + '"'
+
+
+def gravar_arquivo(caminho, conteudo):
+    with open(caminho, "wb") as f:
+        f.write(conteudo)
+    return {"arquivo": os.path.basename(caminho), "bytes": len(conteudo), "etag": calcular_etag(conteudo)}
+
+
+def versao_atual(diretorio=publicacao_dir):
+    try:
+        with open(os.path.join(diretorio, "atual.txt"), encoding="utf-8") as f:
+            return f.read().strip() or None
+    except OSError:
+        return None
+
+
+def remover_versoes_antigas(diretorio, atual, manter=VERSOES_ANTERIORES):
+    versoes = [e for e in os.scandir(diretorio) if e.is_dir() and e.name != atual and not e.name.endswith(".tmp")]
+    versoes.sort(key=lambda e: e.stat().st_mtime, reverse=True)
+    for entrada in versoes[manter:]:
+        shutil.rmtree(entrada.path, ignore_errors=True)
+
+
+def construir(caminho=None, diretorio=publicacao_dir, forcar=False):
+    # Materializa as análises da versão atual dos dados; não refaz uma versão já publicada
+    caminho = caminho or fonte_dados()
+    versao = versao_arquivo(caminho)
+    destino = os.path.join(diretorio, versao)
+    if os.path.isdir(destino) and not forcar:
+        apontar_atual(diretorio, versao)
+        return destino
+
+    cubo = carregar_cubo(caminho)
+    resultados = indicadores_estados(cubo)
+    anos_referencia = [int(ano) for ano in cubo["anos_referencia"]]
+
+    temporario = f"{destino}.{os.getpid()}.tmp"
+    os.makedirs(temporario)
+    try:
+        manifesto = {
+            "versao": versao,
+            "gerado_em": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "anos_referencia": anos_referencia,
+            "analises": {},
+        }
+        for nome, (chave, descricao) in analises.items():
+            df = resultados[chave]
+            # Categorias viram texto para que o Parquet não dependa do dicionário de categorias
+            df = df.astype({coluna: str for coluna in df.select_dtypes(include="category").columns})
+            parquet = io.BytesIO()
+            df.to_parquet(parquet, index=False, compression="zstd")
+            arquivo_parquet = gravar_arquivo(os.path.join(temporario, f"{nome}.parquet"), parquet.getvalue())
+            documento = {"analise": nome, "versao": versao, "anos_referencia": anos_referencia,
+                         "dados": json.loads(df.to_json(orient="records", force_ascii=False))}
+            # mtime=0 deixa o gzip determinístico: mesmos dados, mesmo ETag
+            arquivo_json = gravar_arquivo(os.path.join(temporario, f"{nome}.json.gz"),
+                                          gzip.compress(json.dumps(documento, ensure_ascii=False).encode("utf-8"), mtime=0))
+            manifesto["analises"][nome] = {
+                "descricao": descricao, "linhas": len(df), "colunas": list(map(str, df.columns)),
+                "parquet": arquivo_parquet, "json": arquivo_json,
+            }
+        with open(os.path.join(temporario, "manifesto.json"), "w", encoding="utf-8") as f:
+            json.dump(manifesto, f, ensure_ascii=False, indent=1)
+        if os.path.isdir(destino):
+            shutil.rmtree(destino)
+        os.replace(temporario, destino)
+    finally:
+        if os.path.exists(temporario):
+            shutil.rmtree(temporario)
+
+    apontar_atual(diretorio, versao)
+    remover_versoes_antigas(diretorio, versao)
+    return destino
+
+
+def apontar_atual(diretorio, versao):
+    # Troca atômica: o servidor passa a responder com a nova versão na próxima requisição
+    temporario = os.path.join(diretorio, f"atual.txt.{os.getpid()}.tmp")
+    with open(temporario, "w", encoding="utf-8") as f:
+        f.write(versao)
+    os.replace(temporario, os.path.join(diretorio, "atual.txt"))
+
+
+def marca_manifesto(diretorio, versao):
+    # Entra na chave dos caches abaixo: "construir --forcar" regrava uma versão já publicada
+    return versao_arquivo(os.path.join(diretorio, versao, "manifesto.json"))
+
+
+@functools.lru_cache(maxsize=16)
+def ler_manifesto(diretorio, versao, marca):
+    with open(os.path.join(diretorio, versao, "manifesto.json"), "rb") as f:
+        conteudo = f.read()
+    return json.loads(conteudo), conteudo
+
+
+@functools.lru_cache(maxsize=64)
+def ler_publicado(diretorio, versao, nome, compactado, marca):
+    # (conteúdo, ETag) de um arquivo publicado, em memória enquanto o manifesto da versão não mudar.
+    # None quando o nome não é uma análise da versão (evita servir caminhos arbitrários)
+    manifesto, conteudo = ler_manifesto(diretorio, versao, marca)
+    if nome == "manifesto.json":
+        return conteudo, calcular_etag(conteudo)
+    analise, extensao = os.path.splitext(nome)
+    if analise not in manifesto["analises"] or extensao not in tipos_conteudo:
+        return None
+    arquivo = manifesto["analises"][analise][extensao[1:]]
+    with open(os.path.join(diretorio, versao, arquivo["arquivo"]), "rb") as f:
+        conteudo = f.read()
+    if extensao == ".json" and not compactado:
+        conteudo = gzip.decompress(conteudo)
+        return conteudo, calcular_etag(conteudo)
+    return conteudo, arquivo["etag"]
+
+
+class ServidorPublicacao(BaseHTTPRequestHandler):
+    diretorio = publicacao_dir
+    server_version = "PublicacaoMapBiomas/1.0"
+    # Conexões persistentes para leitores que baixam várias análises seguidas
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        self.responder(corpo=True)
+
+    def do_HEAD(self):
+        self.responder(corpo=False)
+
+    def responder(self, corpo):
+        partes = [p for p in urlsplit(self.path).path.split("/") if p] or ["manifesto.json"]
+        atual = versao_atual(self.diretorio)
+        if atual is None:
+            return self.send_error(503, "Nenhuma versão publicada; execute: python publicacao.py construir")
+        if len(partes) == 1:
+            versao, nome, imutavel = atual, partes[0], False
+        elif len(partes) == 2 and re.fullmatch(r"[\w-]+", partes[0]):
+            (versao, nome), imutavel = partes, True
+        else:
+            return self.send_error(404)
+
+        json_analise = nome.endswith(".json") and nome != "manifesto.json"
+        compactado = json_analise and "gzip" in self.headers.get("Accept-Encoding", "")
+        try:
+            publicado = ler_publicado(self.diretorio, versao, nome, compactado, marca_manifesto(self.diretorio, versao))
+        except (OSError, ValueError):
+            publicado = None
+        if publicado is None:
+            return self.send_error(404)
+        conteudo, etag = publicado
+
+        cabecalhos = {
+            "ETag": etag,
+            # Endereço sem versão: o cliente guarda a resposta, mas revalida a cada uso
+            "Cache-Control": "public, max-age=31536000, immutable" if imutavel else "public, no-cache",
+            "X-Versao-Dados": versao,
+        }
+        if json_analise:
+            cabecalhos["Vary"] = "Accept-Encoding"
+
+        condicionais = etags_condicionais(self.headers.get("If-None-Match"))
+        if etag in condicionais or "*" in condicionais:
+            self.send_response(304)
+            for chave, valor in cabecalhos.items():
+                self.send_header(chave, valor)
+            return self.end_headers()
+
+        self.send_response(200)
+        for chave, valor in cabecalhos.items():
+            self.send_header(chave, valor)
+        self.send_header("Content-Type", tipos_conteudo[os.path.splitext(nome)[1]])
+        if compactado:
+            self.send_header("Content-Encoding", "gzip")
+        self.send_header("Content-Length", str(len(conteudo)))
+        self.end_headers()
+        if corpo:
+            self.wfile.write(conteudo)
+
+
+def etags_condicionais(cabecalho):
+    # If-None-Match compara de forma fraca: W/"x" equivale a "x"
+    if not cabecalho:
+        return set()
+    return {etag.strip().removeprefix("W/") for etag in cabecalho.split(",")}
+
+
+def servir(endereco="127.0.0.1", porta=8502, diretorio=publicacao_dir):
+    manipulador = type("Manipulador", (ServidorPublicacao,), {"diretorio": diretorio})
+    servidor = ThreadingHTTPServer((endereco, porta), manipulador)
+    print(f"Servindo {diretorio} em http://{endereco}:{porta}/ (versão atual: {versao_atual(diretorio)})")
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servidor.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Publica as análises por estado em Parquet/JSON e as serve por HTTP.")
+    comandos = parser.add_subparsers(dest="comando", required=True)
+    construcao = comandos.add_parser("construir", help="Grava as análises da versão atual dos dados")
+    construcao.add_argument("--forcar", action="store_true", help="Regrava mesmo se a versão já estiver publicada (o servidor passa a servir os novos arquivos; clientes podem manter a cópia anterior dos endereços com versão)")
+    servico = comandos.add_parser("servir", help="Serve os arquivos publicados com ETag/GET condicional")
+    servico.add_argument("--endereco", default="127.0.0.1")
+    servico.add_argument("--porta", type=int, default=8502)
+    args = parser.parse_args()
+
+    if args.comando == "construir":
+        print(f"Análises publicadas em {construir(forcar=args.forcar)}")
+    else:
+        servir(args.endereco, args.porta)
+
+
+if __name__ == "__main__":
+    main()
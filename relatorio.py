@@ -0,0 +1,207 @@
+import asyncio
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from io import BytesIO
+
+import streamlit as st
+
+import graficos
+from agregados import antropizacao, comparar_anos, fatia_anual, fatia_decada, variacao_classes
+from mapas import anos_comparativo, imagem_com_pin
+
+# Relatórios prontos mantidos em memória
+MAXIMO_RELATORIOS = 32
+# Abas do navegador do kaleido rasterizando gráficos ao mesmo tempo
+ABAS_RASTERIZACAO = min(4, os.cpu_count() or 1)
+LARGURA_FIGURA, ALTURA_FIGURA = 1000, 500
+
+
+async def _rasterizar(figuras, ao_concluir):
+    import kaleido
+
+    opcoes = {"format": "png", "width": LARGURA_FIGURA, "height": ALTURA_FIGURA}
+    async with kaleido.Kaleido(n=ABAS_RASTERIZACAO) as k:
+        async def uma(fig):
+            imagem = await k.calc_fig(fig, opts=opcoes)
+            ao_concluir()
+            return imagem
+        return await asyncio.gather(*(uma(fig) for fig in figuras))
+
+
+def rasterizar_figuras(figuras, ao_concluir=lambda: None):
+    # PNGs em memória, na mesma ordem das figuras; o Chrome roda em processos próprios
+    return asyncio.run(_rasterizar(figuras, ao_concluir))
+
+
+def figuras_relatorio(cubo, cidade):
+    ano_inicial, ano_final = cubo["anos_referencia"]
+    serie = fatia_anual(cubo, cidade, (ano_inicial, ano_final), cubo["total_ano"].index.get_level_values("nome_classe").unique())
+    df_serie = serie.reset_index()
+    df_ano_final = df_serie[df_serie["ano"] == ano_final]
+    return [
+        graficos.linha_classes(df_serie),
+        graficos.area_classes(df_serie),
+        graficos.dispersao_classes(df_serie),
+        graficos.barras_distribuicao(df_ano_final, ano_final),
+        graficos.pizza_participacao(df_ano_final, ano_final),
+        graficos.barras_decada(fatia_decada(cubo, cidade, (ano_inicial, ano_final), serie.index.get_level_values("nome_classe").unique()).reset_index()),
+        graficos.barras_comparacao(comparar_anos(serie, ano_inicial, ano_final), ano_inicial, ano_final),
+        graficos.barras_variacao(variacao_classes(cubo, cidade)),
+        graficos.linha_antropizacao(antropizacao(serie, ["ano"])),
+    ]
+
+
+def montar_pdf(cidade, anos_referencia, imagens_figuras, mapas):
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.utils import ImageReader
+    from reportlab.pdfgen import canvas
+
+    buffer = BytesIO()
+    c = canvas.Canvas(buffer, pagesize=A4)
+    c.setFont("Helvetica-Bold", 14)
+    c.drawString(50, 800, f"Relatório de Análise Ambiental - {cidade}")
+    c.setFont("Helvetica", 10)
+    c.drawString(50, 785, f"Gerado em: {datetime.now().strftime('%d/%m/%Y %H:%M:%S')}")
+
+    # Gráficos, um por página (o primeiro junto ao título)
+    for imagem in imagens_figuras:
+        c.drawImage(ImageReader(BytesIO(imagem)), 50, 500, width=500, height=250)
+        c.showPage()
+
+    # Mapas com pin
+    for ano, imagem in mapas:
+        c.drawImage(ImageReader(BytesIO(imagem)), 50, 500, width=500, height=250)
+        c.drawString(50, 480, f"Mapa de {cidade} em {ano}")
+        c.showPage()
+
+    # Sumário
+    c.setFont("Helvetica-Bold", 12)
+    c.drawString(50, 780, "Sumário")
+    c.setFont("Helvetica", 10)
+    c.drawString(70, 760, "1. Introdução")
+    c.drawString(70, 745, f"2. Mapas com Localização ({' e '.join(ano for ano, _ in mapas)})")
+    c.drawString(70, 730, "3. Análises Gráficas")
+    c.drawString(70, 715, "4. Indicadores e Alertas")
+    c.drawString(70, 700, "5. Índice de Antropização")
+    c.showPage()
+
+    # Texto descritivo adicional nas seções
+    c.setFont("Helvetica", 10)
+    c.drawString(50, 780, "Este relatório apresenta uma visão abrangente da dinâmica de uso e cobertura do solo para o município selecionado.")
+    c.drawString(50, 765, f"Foram considerados dados do MapBiomas de {anos_referencia[0]} a {anos_referencia[1]}, com foco em variações de área, indicadores de antropização e alertas ambientais.")
+    c.drawString(50, 750, "Os mapas com localização geográfica do município destacam a posição em diferentes anos, permitindo rápida referência espacial.")
+    c.drawString(50, 735, "Os gráficos seguintes ilustram as principais tendências de uso da terra, evolução por classe, participação percentual e análises de mudança.")
+    c.drawString(50, 720, "Ao final, são apresentados indicadores importantes, como o índice de antropização e o ano com maior alteração de cobertura.")
+    c.showPage()
+
+    c.save()
+    return buffer.getvalue()
+
+
+class TarefaRelatorio:
+    def __init__(self, cidade, versao):
+        self.cidade = cidade
+        self.versao = versao
+        self.progresso = 0.0
+        self.etapa = "Na fila"
+        self.pdf = None
+        self.erro = None
+
+    @property
+    def concluida(self):
+        return self.pdf is not None or self.erro is not None
+
+
+class GerenciadorRelatorios:
+    # Gera relatórios fora da thread da requisição e guarda os prontos por (município, versão)
+
+    def __init__(self):
+        self._threads = ThreadPoolExecutor(max_workers=2, thread_name_prefix="relatorio")
+        self._tarefas = OrderedDict()
+        self._trava = threading.Lock()
+
+    def tarefa(self, cidade, versao):
+        with self._trava:
+            return self._tarefas.get((cidade, versao))
+
+    def solicitar(self, cidade, versao, cubo):
+        chave = (cidade, versao)
+        with self._trava:
+            tarefa = self._tarefas.get(chave)
+            if tarefa is not None and tarefa.erro is None:
+                return tarefa
+            tarefa = TarefaRelatorio(cidade, versao)
+            self._tarefas[chave] = tarefa
+            while len(self._tarefas) > MAXIMO_RELATORIOS:
+                self._tarefas.popitem(last=False)
+        self._threads.submit(self._executar, tarefa, cubo)
+        return tarefa
+
+    def _executar(self, tarefa, cubo):
+        try:
+            tarefa.etapa = "Preparando gráficos"
+            figuras = figuras_relatorio(cubo, tarefa.cidade)
+            total = len(figuras) + 2
+
+            tarefa.etapa = "Exportando gráficos"
+
+            def ao_concluir():
+                tarefa.progresso += 1 / total
+
+            imagens = rasterizar_figuras(figuras, ao_concluir)
+
+            tarefa.etapa = "Inserindo mapas"
+            mapas = []
+            for ano in anos_comparativo():
+                try:
+                    mapas.append((ano, imagem_com_pin(tarefa.cidade, ano)))
+                except Exception:
+                    continue
+            tarefa.progresso = (len(figuras) + 1) / total
+
+            tarefa.etapa = "Montando PDF"
+            tarefa.pdf = montar_pdf(tarefa.cidade, cubo["anos_referencia"], imagens, mapas)
+            tarefa.progresso = 1.0
+            tarefa.etapa = "Concluído"
+        except Exception as e:
+            tarefa.erro = e
+            tarefa.etapa = "Falhou"
+
+
+@st.cache_resource
+def gerenciador_relatorios():
+    return GerenciadorRelatorios()
+
+
+def painel_relatorio(cidade, versao, cubo):
+    gerenciador = gerenciador_relatorios()
+    tarefa = gerenciador.tarefa(cidade, versao)
+
+    if tarefa is None or tarefa.erro is not None:
+        if tarefa is not None:
+            st.sidebar.error(f"Falha ao gerar o relatório: {tarefa.erro}")
+        if st.sidebar.button("📄 Gerar Relatório em PDF"):
+            gerenciador.solicitar(cidade, versao, cubo)
+            st.rerun()
+    elif tarefa.pdf is None:
+        acompanhar_relatorio(cidade, versao)
+    else:
+        st.sidebar.download_button(
+            label="📄 Baixar Relatório PDF",
+            data=tarefa.pdf,
+            file_name=f"relatorio_{cidade}.pdf",
+            mime="application/pdf"
+        )
+
+
+@st.fragment(run_every=1)
+def acompanhar_relatorio(cidade, versao):
+    # Atualiza só este trecho da barra lateral enquanto o relatório é gerado
+    tarefa = gerenciador_relatorios().tarefa(cidade, versao)
+    if tarefa is None or tarefa.concluida:
+        st.rerun()
+    with st.sidebar:
+        st.progress(tarefa.progresso, text=f"Relatório: {tarefa.etapa}")
@@ -0,0 +1,280 @@
+from collections import namedtuple
+
+import pandas as pd
+import plotly.express as px
+import streamlit as st
+
+import graficos
+from agregados import (alertas_perda, antropizacao, carregar_cubo, comparar_anos, comparar_municipios, fatia_anual, fatia_decada,
+                       indicadores_estados, perda_municipios, variacao_classes)
+from denso import USAR_DENSO, carregar_denso
+from desempenho import medir
+from filtros import carregar_motor
+from graficos import figura
+from mudancas import aceleracao, densificar, maior_mudanca, taxa_movel
+
+# Estado dos filtros repassado a cada análise
+Contexto = namedtuple("Contexto", ["versao", "cidade", "intervalo_anos", "classes", "anos", "limite_perda"])
+
+# Resultados das análises, por seção e estado dos filtros
+em_cache = st.cache_resource(max_entries=32, show_spinner=False)
+
+# Transições anuais na média móvel da taxa de mudança
+JANELA_TAXA_MUDANCA = 5
+# Municípios exibidos ao mesmo tempo no modo de comparação
+MAXIMO_MUNICIPIOS_COMPARACAO = 12
+
+# Registro das análises, na ordem em que aparecem no painel
+secoes = {}
+
+
+def secao(nome):
+    def registrar(funcao):
+        secoes[nome] = funcao
+        return funcao
+    return registrar
+
+
+def renderizar(nome, ctx):
+    with medir(f"seção: {nome}"):
+        secoes[nome](ctx)
+
+
+def chave_filtros(ctx, *extras):
+    return (ctx.versao, ctx.cidade, ctx.intervalo_anos, ctx.classes) + extras
+
+
+def serie_anual(ctx):
+    # Uma linha por (ano, classe): exatamente os pontos desenhados
+    return fatia_anual(carregar_cubo(), ctx.cidade, ctx.intervalo_anos, ctx.classes).reset_index()
+
+
+def linhas_filtradas(ctx, colunas):
+    # Linhas do filtro geral, materializadas só quando um gráfico não está em cache e só com as colunas pedidas
+    with medir("filtros"):
+        return carregar_motor().filtrar(ctx.cidade, ctx.intervalo_anos, ctx.classes, colunas)
+
+
+@secao("Evolução Temporal")
+def evolucao_temporal(ctx):
+    chave = chave_filtros(ctx)
+    st.markdown("#### Gráfico de Linha")
+    st.plotly_chart(figura("evolucao_linha", chave, lambda: graficos.linha_classes(serie_anual(ctx))), use_container_width=True)
+    st.markdown("#### Gráfico de Área Acumulada")
+    st.plotly_chart(figura("evolucao_area", chave, lambda: graficos.area_classes(serie_anual(ctx))), use_container_width=True)
+    st.markdown("#### Gráfico de Dispersão por Ano")
+    st.plotly_chart(figura("evolucao_dispersao", chave, lambda: graficos.dispersao_classes(linhas_filtradas(ctx, ["ano", "area_ha", "nome_classe"]))), use_container_width=True)
+
+
+@secao("Distribuição Anual")
+def distribuicao_anual(ctx):
+    ano_analise = st.selectbox("Selecione o ano para análise detalhada:", options=ctx.anos, index=len(ctx.anos)-1, key="ano_distribuicao")
+
+    def construir():
+        df_ano = serie_anual(ctx)
+        return graficos.barras_distribuicao(df_ano[df_ano["ano"] == ano_analise], ano_analise)
+
+    st.plotly_chart(figura("distribuicao", chave_filtros(ctx, ano_analise), construir), use_container_width=True)
+
+
+@secao("Participação Percentual")
+def participacao_percentual(ctx):
+    ano_percentual = st.selectbox("Selecione o ano para o gráfico de participação percentual:", options=ctx.anos, index=len(ctx.anos)-1, key="ano_percentual")
+
+    def construir():
+        df_pizza = serie_anual(ctx)
+        return graficos.pizza_participacao(df_pizza[df_pizza["ano"] == ano_percentual], ano_percentual)
+
+    st.plotly_chart(figura("participacao", chave_filtros(ctx, ano_percentual), construir), use_container_width=True)
+
+
+@secao("Análise por Década")
+def analise_por_decada(ctx):
+    def construir():
+        df_decada = fatia_decada(carregar_cubo(), ctx.cidade, ctx.intervalo_anos, ctx.classes).reset_index()
+        return graficos.barras_decada(df_decada)
+
+    st.plotly_chart(figura("decada", chave_filtros(ctx), construir), use_container_width=True)
+
+
+@em_cache
+def comparacao_anos(versao, cidade, intervalo_anos, classes, ano_comp1, ano_comp2):
+    return comparar_anos(fatia_anual(carregar_cubo(), cidade, intervalo_anos, classes), ano_comp1, ano_comp2)
+
+
+@secao("Comparação Entre Anos")
+def comparacao_entre_anos(ctx):
+    st.markdown("### Comparação Entre Anos")
+    ano_comp1 = st.selectbox("Ano 1:", options=ctx.anos, index=0, key="ano1")
+    ano_comp2 = st.selectbox("Ano 2:", options=ctx.anos, index=len(ctx.anos)-1, key="ano2")
+    df_diff = comparacao_anos(ctx.versao, ctx.cidade, ctx.intervalo_anos, ctx.classes, ano_comp1, ano_comp2)
+    st.dataframe(df_diff.round(2), use_container_width=True)
+    fig_comp = figura("comparacao", chave_filtros(ctx, ano_comp1, ano_comp2),
+                      lambda: graficos.barras_comparacao(df_diff, ano_comp1, ano_comp2))
+    st.plotly_chart(fig_comp, use_container_width=True)
+
+
+@em_cache
+def analises_especiais(versao, cidade, intervalo_anos, classes):
+    cubo = carregar_cubo()
+    ano_inicial, ano_final = cubo["anos_referencia"]
+    df_pivot = variacao_classes(cubo, cidade)
+    resultado = {"df_pivot": df_pivot, "perda_percentual": None, "ano_maior_alteracao": None}
+
+    # 1. Alerta de perda crítica de vegetação nativa (calculado para todos os municípios no cubo)
+    if cidade != "Todos":
+        perda = perda_municipios(cubo, [cidade])
+        if cidade in perda.index:
+            resultado["perda_percentual"] = perda.at[cidade, "perda_percentual"]
+
+    # 2. Ranking de crescimento e perda por classe
+    resultado["top_ganhos"] = df_pivot.sort_values("variação", ascending=False).head(5)[[ano_inicial, ano_final, "variação"]].round(2)
+    resultado["top_perdas"] = df_pivot.sort_values("variação").head(5)[[ano_inicial, ano_final, "variação"]].round(2)
+
+    # 4. Ano de maior alteração, taxa móvel de mudança e aceleração
+    serie = fatia_anual(cubo, cidade, intervalo_anos, classes)
+    tensor = densificar(serie, None)
+    maior = maior_mudanca(tensor)
+    if not maior.empty:
+        resultado["ano_maior_alteracao"] = int(maior["ano"].iloc[0])
+        resultado["valor_maior"] = maior["alteracao"].iloc[0]
+    taxa = taxa_movel(tensor, JANELA_TAXA_MUDANCA)
+    resultado["df_taxa"] = pd.DataFrame({"taxa": taxa.iloc[0], "aceleração": aceleracao(taxa).iloc[0]}) if not taxa.empty else pd.DataFrame()
+
+    # 5. Índice de Antropização
+    resultado["df_idx"] = antropizacao(serie, ["ano"])
+    return resultado
+
+
+@secao("Análises Especiais")
+def secao_analises_especiais(ctx):
+    st.markdown("### Análises Especiais")
+    resultado = analises_especiais(ctx.versao, ctx.cidade, ctx.intervalo_anos, ctx.classes)
+    chave = chave_filtros(ctx)
+    ano_inicial, ano_final = carregar_cubo()["anos_referencia"]
+
+    if resultado["perda_percentual"] is not None and resultado["perda_percentual"] > ctx.limite_perda:
+        st.warning(f"⚠️ Alerta: {ctx.cidade} perdeu mais de {ctx.limite_perda:g}% de sua vegetação nativa entre {ano_inicial} e {ano_final} ({resultado['perda_percentual']:.2f}%).")
+
+    st.markdown(f"#### Ranking de Variação por Classe ({ano_inicial}–{ano_final})")
+    col1, col2 = st.columns(2)
+    col1.markdown("**Maiores Ganhos**")
+    col1.dataframe(resultado["top_ganhos"])
+    col2.markdown("**Maiores Perdas**")
+    col2.dataframe(resultado["top_perdas"])
+
+    st.markdown(f"#### Variação Líquida por Classe ({ano_inicial}–{ano_final})")
+    st.plotly_chart(figura("variacao", (ctx.versao, ctx.cidade), lambda: graficos.barras_variacao(resultado["df_pivot"])), use_container_width=True)
+
+    st.markdown("#### Ano de Maior Alteração de Cobertura")
+    if resultado["ano_maior_alteracao"] is not None:
+        st.info(f"📌 O ano com maior alteração total de cobertura foi {resultado['ano_maior_alteracao']}, com mudança acumulada de {resultado['valor_maior']:.2f} ha.")
+    if not resultado["df_taxa"].empty:
+        st.plotly_chart(figura("taxa_mudanca", chave, lambda: graficos.linha_taxa_mudanca(resultado["df_taxa"], JANELA_TAXA_MUDANCA)), use_container_width=True)
+
+    st.markdown("#### Índice de Antropização por Ano")
+    st.plotly_chart(figura("antropizacao", chave, lambda: graficos.linha_antropizacao(resultado["df_idx"])), use_container_width=True)
+
+
+@em_cache
+def ranking_alertas(versao, limite):
+    return alertas_perda(carregar_cubo(), limite)
+
+
+@secao("Alertas de Vegetação Nativa")
+def alertas_vegetacao_nativa(ctx):
+    ano_inicial, ano_final = carregar_cubo()["anos_referencia"]
+    criticos, estados = ranking_alertas(ctx.versao, ctx.limite_perda)
+    colunas = {"NM_MUN": "Município", "SIGLA_UF": "UF", "perda_percentual": "Perda (%)",
+               "municipios_criticos": "Municípios Críticos", "municipios": "Municípios"}
+
+    st.markdown(f"### Municípios com Perda de Vegetação Nativa Acima de {ctx.limite_perda:g}% ({ano_inicial}–{ano_final})")
+    st.caption(f"{len(criticos)} municípios acima do limite, da maior para a menor perda. Clique no cabeçalho de uma coluna para reordenar.")
+    tabela = criticos.reset_index().rename(columns=colunas).round(2)
+    st.dataframe(tabela, use_container_width=True, hide_index=True)
+    st.download_button(
+        label="Baixar lista de municípios críticos (CSV)",
+        data=tabela.to_csv(index=False, sep=";", decimal=","),
+        file_name=f"alertas_vegetacao_nativa_{ctx.limite_perda:g}.csv",
+        mime="text/csv"
+    )
+
+    st.markdown("### Perda de Vegetação Nativa por Estado")
+    st.dataframe(estados.reset_index().rename(columns=colunas).round(2), use_container_width=True, hide_index=True)
+
+
+@em_cache
+def analises_estados(versao, estados_selecionados):
+    return indicadores_estados(carregar_cubo(), estados_selecionados)
+
+
+@secao("Análises por Estados")
+def analises_por_estados(ctx):
+    st.markdown("Análises por Estado")
+
+    cubo = carregar_cubo()
+    ano_inicial, ano_final = cubo["anos_referencia"]
+    estados_disponiveis = sorted(cubo["municipios_estado"].index)
+    estados_selecionados = st.multiselect("Filtrar estados:", estados_disponiveis, default=estados_disponiveis)
+    resultado = analises_estados(ctx.versao, tuple(estados_selecionados))
+    chave = (ctx.versao, tuple(estados_selecionados))
+
+    st.markdown("### 1. Quantidade de Municípios por Estado")
+    st.dataframe(resultado["df_mun"])
+    st.plotly_chart(figura("estados_municipios", chave, lambda: px.bar(resultado["df_mun"], x="SIGLA_UF", y="Quantidade de Municípios", title="Quantidade de Municípios por Estado")), use_container_width=True)
+
+    st.markdown(f"### 2. Perda de Vegetação Nativa por Estado ({ano_inicial}–{ano_final})")
+    st.plotly_chart(figura("estados_nativa", chave, lambda: px.bar(resultado["df_nat_agg"], x="SIGLA_UF", y="variação", title="Perda Total de Vegetação Nativa (ha)", labels={"variação": "Perda (ha)"})), use_container_width=True)
+
+    st.markdown(f"### 3. Evolução da Cobertura Agrícola ({ano_inicial}–{ano_final})")
+    st.plotly_chart(figura("estados_agricola", chave, lambda: px.bar(resultado["df_agro"], x="SIGLA_UF", y="crescimento", color="nome_classe", title="Crescimento de Cobertura Agrícola por Estado")), use_container_width=True)
+
+    st.markdown("### 4. Urbanização por Estado ao Longo do Tempo")
+    st.plotly_chart(figura("estados_urbana", chave, lambda: px.line(resultado["df_urb_agg"], x="ano", y="area_ha", color="SIGLA_UF", title="Evolução da Área Urbana por Estado")), use_container_width=True)
+
+    st.markdown("### 5. Índice Médio de Antropização por Estado")
+    st.plotly_chart(figura("estados_antropizacao", chave, lambda: px.line(resultado["df_idx"], x="ano", y="índice", color="SIGLA_UF", title="Índice de Antropização por Estado")), use_container_width=True)
+
+    st.markdown("### 6. Diversidade de Classes por Estado")
+    st.plotly_chart(figura("estados_diversidade", chave, lambda: px.line(resultado["df_div"], x="ano", y="n_classes", color="SIGLA_UF", title="Número de Classes de Uso e Cobertura por Estado")), use_container_width=True)
+
+    st.markdown("### 7. Década com Maior Alteração de Uso e Cobertura por Estado")
+    st.plotly_chart(figura("estados_decada", chave, lambda: px.bar(resultado["df_alt_max"], x="SIGLA_UF", y="alteracao", color="decada", title="Década com Maior Alteração por Estado", labels={"alteracao": "Mudança da Área Média Anual (ha)"})), use_container_width=True)
+
+
+@em_cache
+def comparacao_municipios(versao, municipios, intervalo_anos, classes):
+    resultado = comparar_municipios(carregar_cubo(), municipios, intervalo_anos, classes)
+    if USAR_DENSO:
+        tensor = carregar_denso().tensor_municipios(municipios, intervalo_anos, classes)
+    else:
+        tensor = densificar(resultado["serie"])
+    resultado["maior_mudanca"] = maior_mudanca(tensor)
+    return resultado
+
+
+def renderizar_comparacao(ctx, municipios):
+    # Modo de comparação: os N municípios calculados juntos e exibidos lado a lado
+    resultado = comparacao_municipios(ctx.versao, municipios, ctx.intervalo_anos, ctx.classes)
+    chave = chave_filtros(ctx, municipios, ctx.limite_perda)
+    ano_inicial, ano_final = carregar_cubo()["anos_referencia"]
+
+    st.markdown("### Evolução da Cobertura por Município")
+    df_serie = resultado["serie"].reset_index()
+    df_serie["NM_MUN"] = df_serie["NM_MUN"].astype(str)
+    st.plotly_chart(figura("comparacao_municipios", chave, lambda: graficos.linhas_municipios(df_serie)), use_container_width=True)
+
+    st.markdown(f"### Perda de Vegetação Nativa ({ano_inicial}–{ano_final})")
+    df_perda = resultado["perda"]
+    alertas = df_perda.index[df_perda["perda_percentual"] > ctx.limite_perda]
+    if len(alertas):
+        st.warning(f"⚠️ Alerta: perderam mais de {ctx.limite_perda:g}% da vegetação nativa: {', '.join(alertas)}.")
+    col1, col2 = st.columns(2)
+    col1.dataframe(df_perda.round(2), use_container_width=True)
+    col2.plotly_chart(figura("comparacao_perda", chave, lambda: graficos.barras_perda_municipios(df_perda, ctx.limite_perda)), use_container_width=True)
+
+    st.markdown("### Ano de Maior Alteração de Cobertura")
+    st.dataframe(resultado["maior_mudanca"].rename(columns={"ano": "Ano", "alteracao": "Mudança Total (ha)"}).round(2), use_container_width=True)
+
+    st.markdown("### Índice de Antropização por Ano")
+    st.plotly_chart(figura("comparacao_antropizacao", chave, lambda: graficos.linha_antropizacao_municipios(resultado["df_idx"])), use_container_width=True)